@@ -1,36 +1,102 @@
 # app/__init__.py
 
 from flask import Flask
-from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
-import markdown  #  Import Markdown library
+from flask_wtf.csrf import CSRFProtect
 from config import Config
+from app.replicas import RoutingSession
 
 # Initialize extensions (without app for now)
-db = SQLAlchemy()
-migrate = Migrate()
+# RoutingSession sends reads in GET requests to read replicas, if configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login = LoginManager()
 login.login_view = 'main.login'  # Redirect to login page if user not logged in
+csrf = CSRFProtect()  # every form POST carries a token (csrf_token() in templates)
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+
+    # Client address and scheme from the trusted proxy's X-Forwarded-* headers
+    if app.config['TRUSTED_PROXIES']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
     login.init_app(app)
+    csrf.init_app(app)
+
+    # Flask-Migrate pulls in alembic; only `flask db ...` needs it
+    from . import startup
+    if startup.running_cli() or app.config['MIGRATIONS_ALWAYS']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # Password hashing pool and login rate limits
+    from . import security
+    security.init_app(app)
+
+    # Logged-in users come from a small per-process cache (see models.load_user)
+    from .models import user_cache
+    user_cache.maxsize = app.config['USER_CACHE_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    user_cache.clear()
+
+    # Per-connection SQLite tuning
+    from . import database
+    database.init_app(app)
+
+    # Read-your-writes bookkeeping for replica routing
+    from . import replicas
+    replicas.init_app(app)
+
+    # Opt-in request/SQL/template timing, /metrics and Server-Timing.
+    # Hooked up first so its timer wraps every other request hook.
+    from . import instrumentation
+    instrumentation.init_app(app)
+
+    # gzip/brotli for text responses; registered early so it sees the final body
+    from . import compression
+    compression.init_app(app)
+
+    # Fingerprinted, precompressed static files and asset_url()
+    from . import assets
+    assets.init_app(app)
 
     # Register blueprints (routes grouped together)
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
 
-    # Markdown filter for Jinja2 templates
-    @app.template_filter('markdown')
-    def markdown_filter(text):
-        # Convert Markdown to HTML safely
-        return Markup(markdown.markdown(text, extensions=["fenced_code"]))
+    # Markdown rendering cache + `markdown` template filter
+    from . import rendering
+    rendering.init_app(app)
+
+    # Encoded-payload cache for the JSON API
+    from . import serializers
+    serializers.init_app(app)
+
+    # Pre-rendered home feed, and per-user timelines
+    from . import feed, timeline
+    feed.init_app(app)
+    timeline.init_app(app)
+
+    # Cached Atom feeds
+    from . import syndication
+    syndication.init_app(app)
+
+    # Cache for anonymous page views, invalidated when posts change
+    # (importing it pulls in app/signals.py, which hooks the session)
+    from . import response_cache
+    response_cache.init_app(app)
+
+    # Jinja bytecode cache (see gunicorn.conf.py for preloading)
+    startup.init_app(app)
+
+    # Custom `flask` CLI commands
+    from . import cli
+    cli.register(app)
 
     return app
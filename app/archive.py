@@ -0,0 +1,246 @@
+# app/archive.py
+
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, false, func, insert, select, true, union_all, update
+from sqlalchemy.orm import joinedload, selectinload
+from app import db, feed, timeline
+from app.models import (ArchivedComment, ArchivedPost, Comment, Post, PostMonth,
+                        post_tags, post_tags_archive, reactions, reactions_archive)
+from app.pagination import Page
+from app.signals import mark_posts_changed
+
+# Cold posts live in post_archive (+ post_tags_archive, comment_archive,
+# reaction_archive) so the home feed, timelines and the API only ever sort
+# the recent rows in `post`. Reads by id (/post/<id>) and by tag look in
+# both; archived posts are read-only. Search covers the hot table only.
+#
+# post_month keeps the number of posts per calendar month, hot and archived
+# together, for the /archive pages. Writes move it by +1/-1; archiving
+# leaves it alone.
+
+# (hot table, archive table) pairs moved together, parents first
+MOVES = (
+    (Post.__table__, ArchivedPost.__table__, 'id'),
+    (post_tags, post_tags_archive, 'post_id'),
+    (Comment.__table__, ArchivedComment.__table__, 'post_id'),
+    (reactions, reactions_archive, 'post_id'),
+)
+
+
+def month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+# -------------------------
+# Monthly counts
+# -------------------------
+def _add_months(rows):
+    """Upsert post_month rows, adding their post_count to any existing one."""
+    dialect = db.session.get_bind(mapper=PostMonth.__mapper__).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        # No portable upsert: bump the row, insert it if there was none
+        for row in rows:
+            bumped = db.session.execute(
+                update(PostMonth.__table__)
+                .where(PostMonth.year == row['year'], PostMonth.month == row['month'])
+                .values(post_count=PostMonth.post_count + row['post_count'])
+            ).rowcount
+            if not bumped:
+                db.session.execute(insert(PostMonth.__table__), row)
+        return
+    stmt = upsert(PostMonth.__table__)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['year', 'month'],
+        set_={'post_count': PostMonth.post_count + stmt.excluded.post_count},
+    ), rows)
+
+
+def adjust_month_counts(added=(), removed=()):
+    """Move post_month by +1 per timestamp in `added` and -1 per timestamp in `removed`.
+
+    Call in the transaction that creates or deletes the posts; months that
+    reach zero are dropped.
+    """
+    deltas = Counter((ts.year, ts.month) for ts in added if ts is not None)
+    deltas.subtract((ts.year, ts.month) for ts in removed if ts is not None)
+    rows = [{'year': year, 'month': month, 'post_count': delta}
+            for (year, month), delta in deltas.items() if delta > 0]
+    if rows:
+        _add_months(rows)
+    for (year, month), delta in deltas.items():
+        if delta < 0:
+            which = (PostMonth.year == year, PostMonth.month == month)
+            db.session.execute(update(PostMonth.__table__).where(*which)
+                               .values(post_count=PostMonth.post_count + delta))
+            db.session.execute(delete(PostMonth).where(*which, PostMonth.post_count <= 0))
+
+
+def refresh_month_counts(timestamps):
+    """Recount post_month rows for the months of `timestamps`.
+
+    Both counts are range scans of the timestamp indexes, so this is for
+    repairs (see recount_months()); writes use adjust_month_counts().
+    """
+    months = {(ts.year, ts.month) for ts in timestamps if ts is not None}
+    for year, month in months:
+        start, end = month_range(year, month)
+        count = db.session.scalar(select(
+            select(func.count()).select_from(Post)
+            .where(Post.timestamp >= start, Post.timestamp < end).scalar_subquery()
+            + select(func.count()).select_from(ArchivedPost)
+            .where(ArchivedPost.timestamp >= start, ArchivedPost.timestamp < end).scalar_subquery()
+        ))
+        db.session.execute(delete(PostMonth).where(PostMonth.year == year, PostMonth.month == month))
+        if count:
+            db.session.execute(insert(PostMonth).values(year=year, month=month, post_count=count))
+
+
+def recount_months():
+    """Recount every month from the first post to the last, and any stray rows."""
+    stamps = [ts for model in (Post, ArchivedPost)
+              for ts in db.session.execute(select(func.min(model.timestamp), func.max(model.timestamp))).one()
+              if ts is not None]
+    found = {(row.year, row.month) for row in months()}
+    if stamps:
+        first, last = min(stamps), max(stamps)
+        year, month = first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            found.add((year, month))
+            year, month = year + month // 12, month % 12 + 1
+    refresh_month_counts(datetime(year, month, 1) for year, month in found)
+
+
+def months():
+    """PostMonth rows, newest month first."""
+    return db.session.scalars(
+        select(PostMonth).order_by(PostMonth.year.desc(), PostMonth.month.desc())
+    ).all()
+
+
+# -------------------------
+# Reads across hot and archived posts
+# -------------------------
+def _newest(hot, cold, offset, limit):
+    """One page of (id, archived) from two (id, timestamp) selects, newest first.
+
+    Each side is cut to offset + limit rows on its own index before the two
+    are merged, so deep tables aren't sorted as a whole.
+    """
+    # a negative LIMIT means "no limit" to SQLite
+    if offset < 0 or limit < 1:
+        return []
+    want = offset + limit
+    hot = hot.order_by(Post.timestamp.desc(), Post.id.desc()).limit(want).subquery()
+    cold = cold.order_by(ArchivedPost.timestamp.desc(), ArchivedPost.id.desc()).limit(want).subquery()
+    merged = union_all(
+        select(hot.c.id, hot.c.timestamp, false().label('archived')),
+        select(cold.c.id, cold.c.timestamp, true().label('archived')),
+    ).subquery()
+    return db.session.execute(
+        select(merged.c.id, merged.c.archived)
+        .order_by(merged.c.timestamp.desc(), merged.c.id.desc())
+        .offset(offset).limit(limit)
+    ).all()
+
+
+def _load(rows):
+    """Posts and archived posts for (id, archived) rows, in row order."""
+    hot_ids = [id for id, archived in rows if not archived]
+    cold_ids = [id for id, archived in rows if archived]
+    found = {}
+    if hot_ids:
+        found.update(((False, post.id), post) for post in db.session.scalars(
+            select(Post).options(joinedload(Post.author), selectinload(Post.tags))
+            .where(Post.id.in_(hot_ids))))
+    if cold_ids:
+        found.update(((True, post.id), post) for post in db.session.scalars(
+            select(ArchivedPost).options(joinedload(ArchivedPost.author), selectinload(ArchivedPost.tags))
+            .where(ArchivedPost.id.in_(cold_ids))))
+    return [found[bool(archived), id] for id, archived in rows if (bool(archived), id) in found]
+
+
+def tag_page(tag, page, per_page):
+    """Posts with `tag`, hot and archived, newest first; totalled from Tag.post_count."""
+    hot = (select(Post.id, Post.timestamp)
+           .join(post_tags, post_tags.c.post_id == Post.id).where(post_tags.c.tag_id == tag.id))
+    cold = (select(ArchivedPost.id, ArchivedPost.timestamp)
+            .join(post_tags_archive, post_tags_archive.c.post_id == ArchivedPost.id)
+            .where(post_tags_archive.c.tag_id == tag.id))
+    rows = _newest(hot, cold, (page - 1) * per_page, per_page)
+    return Page(_load(rows), page, per_page, tag.post_count)
+
+
+def month_page(year, month, page, per_page):
+    """Posts from one calendar month, newest first; totalled from post_month."""
+    start, end = month_range(year, month)
+    hot = select(Post.id, Post.timestamp).where(Post.timestamp >= start, Post.timestamp < end)
+    cold = (select(ArchivedPost.id, ArchivedPost.timestamp)
+            .where(ArchivedPost.timestamp >= start, ArchivedPost.timestamp < end))
+    total = db.session.scalar(
+        select(PostMonth.post_count).where(PostMonth.year == year, PostMonth.month == month)) or 0
+    rows = _newest(hot, cold, (page - 1) * per_page, per_page) if total else []
+    return Page(_load(rows), page, per_page, total)
+
+
+def find_post(post_id):
+    """The archived post with this id, or None."""
+    return db.session.scalar(
+        select(ArchivedPost).options(joinedload(ArchivedPost.author), selectinload(ArchivedPost.tags))
+        .where(ArchivedPost.id == post_id)
+    )
+
+
+# -------------------------
+# Archiving
+# -------------------------
+def archive_batch(before, batch_size):
+    """Move up to batch_size posts older than `before` into the archive.
+
+    Copies the rows across with INSERT ... SELECT and deletes them from the
+    hot tables in one transaction. Returns the moved (post id, author id)
+    pairs, oldest first.
+    """
+    # post and comment ids are never reused (AUTOINCREMENT on SQLite), so
+    # archived rows can't collide with new ones
+    moved = db.session.execute(
+        select(Post.id, Post.user_id).where(Post.timestamp < before)
+        .order_by(Post.timestamp, Post.id).limit(batch_size)
+    ).all()
+    if not moved:
+        return []
+    ids = [id for id, _ in moved]
+
+    for hot, cold, key in MOVES:
+        columns = [column.name for column in cold.c]
+        db.session.execute(insert(cold).from_select(
+            columns, select(*(hot.c[name] for name in columns)).where(hot.c[key].in_(ids))))
+    for hot, _, key in reversed(MOVES):
+        db.session.execute(delete(hot).where(hot.c[key].in_(ids)))
+    # Tag, author and month counts cover both tables, so they don't change
+    feed.remove_from_feed(ids)
+
+    mark_posts_changed()
+    db.session.commit()
+    for author_id in {author_id for _, author_id in moved}:
+        timeline.forget_author(author_id)
+    return moved
+
+
+def archive_posts(before, batch_size=500):
+    """Archive every post older than `before`, batch by batch.
+
+    Yields the number of posts moved by each batch.
+    """
+    while True:
+        moved = archive_batch(before, batch_size)
+        if not moved:
+            return
+        yield len(moved)
@@ -0,0 +1,113 @@
+# app/assets.py
+
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from app.compression import compress, encodings
+
+# `flask build-assets` copies every file under app/static to
+# app/static/build/ (served at /assets/) with a content hash in its name
+# (css/static.3f9c2a1b.css) plus .gz/.br siblings for text files, and writes
+# manifest.json mapping original names to hashed ones. Templates link through asset_url(), so a
+# changed file gets a new URL and browsers can cache every URL for a year.
+# Without a build (fresh checkout, tests), asset_url() falls back to the
+# plain static URL.
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml'}
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# Built once, served many times: use the slowest, smallest settings
+BUILD_LEVELS = {'br': 11, 'gzip': 9}
+
+
+def build_dir(app):
+    return os.path.join(app.static_folder, BUILD_DIR)
+
+
+def _fingerprint(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:8]
+
+
+def build(app):
+    """Fingerprint and precompress app/static; returns the new manifest."""
+    out = build_dir(app)
+    shutil.rmtree(out, ignore_errors=True)
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    manifest = {}
+    for root, dirs, files in os.walk(app.static_folder):
+        if os.path.abspath(root) == os.path.abspath(app.static_folder):
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, app.static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+            hashed = f'{stem}.{_fingerprint(source)}{ext}'
+            target = os.path.join(out, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            manifest[logical] = hashed
+
+            if ext.lower() not in PRECOMPRESS_EXTENSIONS:
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            for encoding in encodings():
+                with open(target + SUFFIXES[encoding], 'wb') as f:
+                    f.write(compress(data, encoding, BUILD_LEVELS[encoding]))
+
+    with open(os.path.join(out, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    app.extensions['assets'] = manifest
+    return manifest
+
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(build_dir(app), MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(filename):
+    """URL of a static file: fingerprinted if built, plain otherwise."""
+    hashed = current_app.extensions['assets'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=hashed)
+
+
+def serve_asset(filename):
+    """Hashed files only, precompressed when the client accepts it."""
+    if filename not in current_app.extensions['assets'].values():
+        abort(404)
+    directory = build_dir(current_app)
+    mimetype = None
+    sent = filename
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding and os.path.isfile(os.path.join(directory, filename + SUFFIXES[encoding])):
+        sent = filename + SUFFIXES[encoding]
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(directory, sent, mimetype=mimetype,
+                                   max_age=current_app.config['ASSETS_MAX_AGE'])
+    if sent != filename:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The name changes whenever the content does
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = load_manifest(app)
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.add_template_global(asset_url)
@@ -0,0 +1,179 @@
+# app/cli.py
+
+import click
+from sqlalchemy import select
+
+
+def register(app):
+
+    # -------------------
+    # flask render-posts
+    # -------------------
+    @app.cli.command('render-posts')
+    @click.option('--batch-size', default=500, show_default=True,
+                  help='Posts rendered per transaction.')
+    @click.option('--all', 'render_all', is_flag=True,
+                  help='Re-render every post, not just ones missing cached HTML.')
+    def render_posts(batch_size, render_all):
+        """Backfill the rendered-Markdown cache for existing posts."""
+        from app import db
+        from app.models import Post
+
+        stmt = select(Post.id).order_by(Post.id)
+        if not render_all:
+            stmt = stmt.where(Post.content_hash.is_(None))
+        ids = db.session.scalars(stmt).all()
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            for post in db.session.scalars(select(Post).where(Post.id.in_(batch))):
+                if render_all:
+                    post.content_hash = None
+                post.render()
+            db.session.commit()
+            click.echo(f'Rendered {start + len(batch)}/{len(ids)} posts')
+
+    # -------------------
+    # flask import-posts
+    # -------------------
+    @app.cli.command('import-posts')
+    @click.argument('source', type=click.File('rb'))
+    @click.option('--batch-size', default=app.config['IMPORT_BATCH_SIZE'], show_default=True,
+                  help='Posts inserted per transaction.')
+    @click.option('--author', help='Username for records without an "author" field.')
+    def import_posts_command(source, batch_size, author):
+        """Bulk-load posts from an NDJSON file (or a JSON array; "-" for stdin)."""
+        import json
+        from app import db
+        from app.importer import import_posts, iter_lines
+        from app.models import User
+
+        default_author = None
+        if author:
+            user = db.session.scalar(select(User).where(User.username == author))
+            if user is None:
+                raise click.BadParameter(f'no user named {author!r}', param_hint='--author')
+            default_author = user.id
+
+        lines = iter_lines(source)
+        head = source.peek(64) if hasattr(source, 'peek') else b''
+        if head.lstrip()[:1] == b'[':
+            # Plain JSON array (e.g. a list of post.json bodies): loaded in one go
+            lines = ((n, json.dumps(record)) for n, record in enumerate(json.load(source), start=1))
+
+        total_inserted = total_rejected = 0
+        for report in import_posts(lines, batch_size=batch_size, default_author=default_author):
+            total_inserted += report['inserted']
+            total_rejected += len(report['rejected'])
+            click.echo(f"batch {report['batch']}: {report['inserted']} inserted, "
+                       f"{len(report['rejected'])} rejected, {report['seconds']:.2f}s "
+                       f"({report['posts_per_second'] or 0:.0f} posts/s)")
+            for reject in report['rejected']:
+                click.echo(f"  line {reject['line']}: {reject['error']}", err=True)
+        click.echo(f'Imported {total_inserted} posts, rejected {total_rejected} lines')
+
+    # -------------------
+    # flask archive-posts
+    # -------------------
+    @app.cli.command('archive-posts')
+    @click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='Archive posts older than this date (YYYY-MM-DD, UTC).')
+    @click.option('--batch-size', default=app.config['ARCHIVE_BATCH_SIZE'], show_default=True,
+                  help='Posts moved per transaction.')
+    def archive_posts_command(before, batch_size):
+        """Move old posts, with their tags, comments and reactions, to the archive tables."""
+        from app.archive import archive_posts
+
+        total = 0
+        for moved in archive_posts(before, batch_size=batch_size):
+            total += moved
+            click.echo(f'Archived {total} posts')
+        click.echo(f'Archived {total} posts older than {before:%Y-%m-%d}')
+
+    # -------------------
+    # flask rebuild-search
+    # -------------------
+    @app.cli.command('rebuild-search')
+    def rebuild_search():
+        """Recreate the full-text search index from the post table."""
+        from app.search import get_index
+
+        index = get_index(app)
+        if index is None:
+            raise click.ClickException('No search backend for this database; set SEARCH_BACKEND.')
+        index.rebuild()
+        click.echo('Search index rebuilt')
+
+    # -------------------
+    # flask rebuild-feed
+    # -------------------
+    @app.cli.command('rebuild-feed')
+    def rebuild_feed_command():
+        """Re-render the materialised home feed from the post table."""
+        from app.feed import rebuild_feed
+
+        rebuild_feed()
+        click.echo('Home feed rebuilt')
+
+    # -------------------
+    # flask recount
+    # -------------------
+    @app.cli.command('recount')
+    def recount():
+        """Recount the stored tag, author and month counts from scratch, repairing any drift."""
+        from app import db
+        from app.archive import recount_months
+        from app.models import Tag, User
+        from app.profiles import refresh_author_stats
+        from app.tags import refresh_tag_counts
+
+        refresh_tag_counts(db.session.scalars(select(Tag.id)).all())
+        refresh_author_stats(db.session.scalars(select(User.id)).all())
+        recount_months()
+        db.session.commit()
+        click.echo('Tag, author and month counts recounted')
+
+    # -------------------
+    # flask worker
+    # -------------------
+    @app.cli.command('worker')
+    @click.option('--batch-size', default=app.config['JOBS_BATCH_SIZE'], show_default=True,
+                  help='Jobs claimed per round.')
+    @click.option('--poll-interval', default=app.config['JOBS_POLL_INTERVAL'], show_default=True,
+                  help='Seconds to sleep when the queue is empty.')
+    @click.option('--once', is_flag=True, help='Exit once the queue is empty.')
+    def worker(batch_size, poll_interval, once):
+        """Run queued background jobs (post-write side effects)."""
+        from app.jobs import work
+
+        click.echo('Worker started' + (' (draining)' if once else ''))
+        try:
+            done = work(batch_size=batch_size, poll_interval=poll_interval, once=once)
+        except KeyboardInterrupt:
+            return
+        click.echo(f'Ran {done} jobs')
+
+    # -------------------
+    # flask build-assets
+    # -------------------
+    @app.cli.command('build-assets')
+    def build_assets():
+        """Fingerprint and precompress app/static into app/static/build."""
+        from app.assets import build
+
+        manifest = build(app)
+        for name, hashed in sorted(manifest.items()):
+            click.echo(f'{name} -> {hashed}')
+        click.echo(f'Built {len(manifest)} assets')
+
+    # -------------------
+    # flask compile-templates
+    # -------------------
+    @app.cli.command('compile-templates')
+    def compile_templates_command():
+        """Compile all templates into the Jinja bytecode cache."""
+        from app.startup import compile_templates
+
+        if app.jinja_env.bytecode_cache is None:
+            raise click.ClickException('Set JINJA_BYTECODE_CACHE_DIR to compile templates to disk.')
+        click.echo(f'Compiled {compile_templates(app)} templates')
@@ -0,0 +1,65 @@
+# app/comments.py
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import ArchivedComment, Comment, Post, reactions
+from app.pagination import Page
+from app.signals import mark_post_counts_changed, mark_posts_changed
+
+REACTIONS = {'like': 1, 'dislike': -1}
+
+
+def refresh_post_counters(post_id):
+    """Recount Post.likes/dislikes/comment_count inside the current transaction.
+
+    Like tags.refresh_tag_counts(), recounting off the (post_id, ...) indexes
+    rather than +1/-1 means concurrent writers can't make the numbers drift.
+    """
+    def count(table, *where):
+        return select(func.count()).select_from(table).where(*where).scalar_subquery()
+
+    db.session.execute(
+        update(Post).where(Post.id == post_id).values(
+            likes=count(reactions, reactions.c.post_id == post_id, reactions.c.value == 1),
+            dislikes=count(reactions, reactions.c.post_id == post_id, reactions.c.value == -1),
+            comment_count=count(Comment.__table__, Comment.post_id == post_id),
+            version=Post.version + 1,
+        ),
+        execution_options={'synchronize_session': 'fetch'},
+    )
+
+
+def add_comment(post_id, user_id, body):
+    comment = Comment(post_id=post_id, user_id=user_id, body=body)
+    db.session.add(comment)
+    db.session.flush()
+    refresh_post_counters(post_id)
+    mark_posts_changed()  # cached post pages show the comments
+    return comment
+
+
+def react(post_id, user_id, kind):
+    """Like or dislike a post; repeating the same reaction takes it back."""
+    value = REACTIONS[kind]
+    where = (reactions.c.post_id == post_id, reactions.c.user_id == user_id)
+    current = db.session.scalar(select(reactions.c.value).where(*where))
+    db.session.execute(delete(reactions).where(*where))
+    if current != value:
+        db.session.execute(insert(reactions).values(post_id=post_id, user_id=user_id, value=value))
+    refresh_post_counters(post_id)
+    # Anonymous page caches pick the new counts up within RESPONSE_CACHE_TTL;
+    # invalidating every cached page on each click would defeat the cache.
+    mark_post_counts_changed()
+
+
+def comment_page(post, page, per_page):
+    """One page of a post's comments, oldest first, totalled from the stored counter."""
+    model = ArchivedComment if post.archived else Comment
+    items = db.session.scalars(
+        select(model).options(joinedload(model.author))
+        .where(model.post_id == post.id)
+        .order_by(model.timestamp, model.id)
+        .offset((page - 1) * per_page).limit(per_page)
+    ).all()
+    return Page(items, page, per_page, post.comment_count)
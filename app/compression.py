@@ -0,0 +1,68 @@
+# app/compression.py
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli  # optional; gzip alone is fine
+except ImportError:
+    brotli = None
+
+# Compresses text responses (pages, JSON) on the way out. Bodies under
+# COMPRESS_MIN_SIZE aren't worth the CPU or the header bytes; streamed
+# responses (NDJSON exports) and files (static, /assets) are left alone.
+# Static assets get precompressed variants from `flask build-assets`
+# instead, see app/assets.py.
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml',
+    'application/atom+xml', 'image/svg+xml',
+}
+
+
+def encodings():
+    """Content codings we can produce, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compressible(response):
+    return (
+        response.mimetype in COMPRESSIBLE_MIMETYPES
+        and 200 <= response.status_code < 300 and response.status_code != 204
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+    )
+
+
+def init_app(app):
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    levels = {'br': app.config['COMPRESS_BROTLI_QUALITY'], 'gzip': app.config['COMPRESS_LEVEL']}
+    min_size = app.config['COMPRESS_MIN_SIZE']
+
+    @app.after_request
+    def compress_response(response):
+        if not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings())
+        data = response.get_data()
+        if encoding is None or len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding, levels[encoding]))
+        response.headers['Content-Encoding'] = encoding
+        # Same resource, different bytes: only a weak validator still holds
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,23 @@
+# app/database.py
+
+from sqlalchemy import event
+from app import db
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the configured PRAGMAs on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def init_app(app):
+    with app.app_context():
+        for engine in db.engines.values():  # primary and any read replicas
+            apply_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
@@ -0,0 +1,192 @@
+# app/feed.py
+
+from flask import current_app, has_request_context, render_template
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.orm import joinedload, selectinload
+from app import db
+from app.cache import LRUCache
+from app.models import FeedItem, Post
+from app.pagination import Page, decode_cursor, encode_cursor
+from app.signals import posts_changed
+
+# Materialised home feed: feed_item holds the newest FEED_SIZE posts as
+# pre-rendered cards, ordered by the (timestamp, id) index. Feed pages read
+# only this small table, so their cost doesn't grow with the post table.
+# Anything older is read from `post` with a keyset seek.
+
+# Cached total post count for "Page N" links; approximate by design
+_count_cache = LRUCache(maxsize=1)
+
+NEWEST_FIRST = (FeedItem.timestamp.desc(), FeedItem.id.desc())
+
+
+def init_app(app):
+    _count_cache.ttl = app.config['FEED_COUNT_TTL']
+    _count_cache.clear()
+
+
+@posts_changed.connect
+def _forget_count(sender):
+    _count_cache.clear()
+
+
+def post_count():
+    count = _count_cache.get('posts')
+    if count is None:
+        count = db.session.scalar(select(func.count(Post.id)))
+        _count_cache.set('posts', count)
+    return count
+
+
+# -------------------------
+# Writes
+# -------------------------
+def render_card(post):
+    if has_request_context():
+        return render_template('_post_card.html', post=post)
+    # CLI / background callers: url_for() needs a request context
+    with current_app.test_request_context():
+        return render_template('_post_card.html', post=post)
+
+
+def _card_query():
+    return select(Post).options(joinedload(Post.author), selectinload(Post.tags))
+
+
+def _floor():
+    """(timestamp, id) of the oldest card once the feed is full, else None."""
+    return db.session.execute(
+        select(FeedItem.timestamp, FeedItem.id).order_by(*NEWEST_FIRST)
+        .offset(current_app.config['FEED_SIZE'] - 1).limit(1)
+    ).first()
+
+
+def _store(posts):
+    if not posts:
+        return
+    db.session.execute(delete(FeedItem).where(FeedItem.id.in_([post.id for post in posts])))
+    db.session.execute(insert(FeedItem), [
+        {'id': post.id, 'user_id': post.user_id, 'timestamp': post.timestamp,
+         'card_html': render_card(post)}
+        for post in posts
+    ])
+
+
+def _trim():
+    floor = _floor()
+    if floor is not None:
+        db.session.execute(
+            delete(FeedItem).where(tuple_(FeedItem.timestamp, FeedItem.id) < tuple(floor))
+        )
+
+
+def _backfill():
+    """Top the feed back up to FEED_SIZE from the post table after removals."""
+    size = current_app.config['FEED_SIZE']
+    have = db.session.scalar(select(func.count(FeedItem.id)))
+    if have >= size:
+        return
+    stmt = _card_query().order_by(Post.timestamp.desc(), Post.id.desc()).limit(size - have)
+    oldest = db.session.execute(
+        select(FeedItem.timestamp, FeedItem.id).order_by(FeedItem.timestamp, FeedItem.id).limit(1)
+    ).first()
+    if oldest is not None:
+        stmt = stmt.where(tuple_(Post.timestamp, Post.id) < tuple(oldest))
+    _store(db.session.scalars(stmt).all())
+
+
+def refresh_feed(posts):
+    """(Re-)render cards for created or edited posts that belong on the feed."""
+    db.session.flush()  # new posts need their ids
+    refresh_feed_ids([post.id for post in posts])
+
+
+def refresh_feed_ids(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    stmt = (_card_query().where(Post.id.in_(post_ids))
+            .order_by(Post.timestamp.desc(), Post.id.desc()).limit(current_app.config['FEED_SIZE']))
+    floor = _floor()
+    if floor is not None:
+        stmt = stmt.where(tuple_(Post.timestamp, Post.id) >= tuple(floor))
+    _store(db.session.scalars(stmt).all())
+    _trim()
+
+
+def remove_from_feed(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    db.session.flush()
+    db.session.execute(delete(FeedItem).where(FeedItem.id.in_(post_ids)))
+    _backfill()
+
+
+def rebuild_feed():
+    db.session.execute(delete(FeedItem))
+    _backfill()
+    db.session.commit()
+
+
+# -------------------------
+# Reads
+# -------------------------
+def feed_page(page, per_page):
+    """Numbered page of the feed as a Page of FeedItems (or Posts past the window)."""
+    if page < 1:
+        raise ValueError(f'page must be 1 or more, not {page}')
+    offset = (page - 1) * per_page
+    total = post_count()
+    items = db.session.scalars(
+        select(FeedItem).order_by(*NEWEST_FIRST).offset(offset).limit(per_page)
+    ).all()
+    if len(items) < per_page and total > offset + len(items):
+        # Past the materialised window (or the feed isn't built yet)
+        items = db.session.scalars(
+            _card_query().order_by(Post.timestamp.desc(), Post.id.desc()).offset(offset).limit(per_page)
+        ).all()
+    return Page(items, page, per_page, total)
+
+
+def older_than(cursor, per_page):
+    """Up to per_page items strictly older than `cursor`, plus the next cursor.
+
+    Raises ValueError for a malformed cursor.
+    """
+    position = decode_cursor(cursor)
+    want = per_page + 1  # one extra row tells us whether there's a next page
+    items = db.session.scalars(
+        select(FeedItem).where(tuple_(FeedItem.timestamp, FeedItem.id) < tuple_(*position))
+        .order_by(*NEWEST_FIRST).limit(want)
+    ).all()
+    if len(items) < want:
+        last = (items[-1].timestamp, items[-1].id) if items else position
+        items += db.session.scalars(
+            _card_query().where(tuple_(Post.timestamp, Post.id) < tuple_(*last))
+            .order_by(Post.timestamp.desc(), Post.id.desc()).limit(want - len(items))
+        ).all()
+    return items[:per_page], next_cursor(items, per_page)
+
+
+def load_counters(items):
+    """Copy live like/dislike/comment counters onto FeedItems with one PK lookup."""
+    items = [item for item in items if isinstance(item, FeedItem)]
+    if not items:
+        return
+    rows = db.session.execute(
+        select(Post.id, Post.likes, Post.dislikes, Post.comment_count)
+        .where(Post.id.in_([item.id for item in items]))
+    )
+    counters = {row.id: row for row in rows}
+    for item in items:
+        row = counters.get(item.id)
+        if row is not None:
+            item.likes, item.dislikes, item.comment_count = row.likes, row.dislikes, row.comment_count
+
+
+def next_cursor(items, per_page):
+    if len(items) <= per_page:
+        return None
+    last = items[per_page - 1]
+    return encode_cursor(last.timestamp, last.id)
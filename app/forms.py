@@ -24,3 +24,8 @@ class PostForm(FlaskForm):
     content = TextAreaField('Content', validators=[DataRequired()])
     tags = StringField('Tags (comma-separated)', validators=[Optional()])
     submit = SubmitField('Submit')
+
+
+class CommentForm(FlaskForm):
+    body = TextAreaField('Comment', validators=[DataRequired(), Length(max=2000)])
+    submit = SubmitField('Post Comment')
@@ -0,0 +1,154 @@
+# app/importer.py
+
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from app import db
+from app.archive import adjust_month_counts
+from app.feed import refresh_feed_ids
+from app.models import User, Post, post_tags
+from app.profiles import adjust_tag_usage, posts_added
+from app.rendering import render_markdown, content_hash
+from app.signals import mark_posts_changed
+from app.tags import adjust_tag_counts, normalize_tag_names, resolve_tag_map
+from app.timeline import push_posts
+
+
+# -------------------
+# Parsing / validation
+# -------------------
+def parse_record(line):
+    """Parse and validate one NDJSON line. Returns a clean dict or raises ValueError."""
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f'invalid JSON: {exc.msg}')
+    if not isinstance(data, dict):
+        raise ValueError('expected a JSON object')
+
+    title, content = data.get('title'), data.get('content')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError('missing title')
+    if len(title) > 140:
+        raise ValueError('title longer than 140 characters')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('missing content')
+
+    tags = data.get('tags', [])
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise ValueError('tags must be a list of strings')
+
+    timestamp = data.get('timestamp')
+    if timestamp is not None:
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError('timestamp must be an ISO 8601 string')
+
+    author = data.get('author')
+    if author is not None and not isinstance(author, str):
+        raise ValueError('author must be a username')
+
+    return {'title': title, 'content': content, 'tags': normalize_tag_names(tags),
+            'timestamp': timestamp or datetime.utcnow(), 'author': author}
+
+
+def iter_lines(stream):
+    """Yield (line number, text) for each non-blank line of a text or binary stream."""
+    for lineno, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if line.strip():
+            yield lineno, line
+
+
+# -------------------
+# Bulk insert
+# -------------------
+def _insert_batch(records, default_author):
+    usernames = {record['author'] for _, record in records if record['author']}
+    user_ids = dict(db.session.execute(
+        select(User.username, User.id).where(User.username.in_(usernames))
+    ).all()) if usernames else {}
+
+    rows, accepted, rejected = [], [], []
+    for lineno, record in records:
+        if record['author'] and record['author'] not in user_ids:
+            rejected.append({'line': lineno, 'error': f"unknown author {record['author']!r}"})
+            continue
+        user_id = user_ids[record['author']] if record['author'] else default_author
+        rows.append({
+            'title': record['title'], 'content': record['content'],
+            'timestamp': record['timestamp'], 'user_id': user_id,
+            'content_hash': content_hash(record['content']),
+            'content_html': render_markdown(record['content']),
+        })
+        accepted.append(record)
+
+    if not rows:
+        return 0, rejected
+
+    # executemany-style insert; RETURNING keeps ids in parameter order
+    ids = db.session.scalars(
+        insert(Post).returning(Post.id, sort_by_parameter_order=True), rows
+    ).all()
+
+    tags = resolve_tag_map({name for record in accepted for name in record['tags']})
+    links = [{'post_id': post_id, 'tag_id': tags[name].id}
+             for post_id, record in zip(ids, accepted) for name in record['tags']]
+    if links:
+        db.session.execute(post_tags.insert(), links)
+        adjust_tag_counts(link['tag_id'] for link in links)
+        authors = {post_id: row['user_id'] for post_id, row in zip(ids, rows)}
+        adjust_tag_usage((authors[link['post_id']], link['tag_id']) for link in links)
+
+    posts_added((row['user_id'], row['timestamp']) for row in rows)
+    adjust_month_counts(row['timestamp'] for row in rows)
+    refresh_feed_ids(ids)
+    mark_posts_changed()
+    db.session.commit()
+    push_posts((post_id, row['user_id'], row['timestamp']) for post_id, row in zip(ids, rows))
+    return len(ids), rejected
+
+
+def import_posts(lines, batch_size=500, default_author=None, only_author=None):
+    """Import posts from an iterable of NDJSON lines in batches.
+
+    `lines` yields (line number, text) pairs, see iter_lines(). `default_author`
+    is the user id for records without an "author" username. With
+    `only_author` (a username), records naming anyone else are rejected; the
+    HTTP endpoint uses it so users can only import their own posts. Yields one report
+    dict per batch: inserted/rejected counts, rejected lines with reasons,
+    elapsed seconds and posts per second.
+    """
+    def flush(number, pending, rejected, started):
+        try:
+            inserted, refused = _insert_batch(pending, default_author) if pending else (0, [])
+        except Exception:
+            db.session.rollback()
+            raise
+        rejected = rejected + refused
+        elapsed = time.perf_counter() - started
+        return {'batch': number, 'inserted': inserted, 'rejected': rejected,
+                'seconds': round(elapsed, 4),
+                'posts_per_second': round(inserted / elapsed, 1) if elapsed else None}
+
+    number, pending, rejected = 1, [], []
+    started = time.perf_counter()
+    for lineno, line in lines:
+        try:
+            record = parse_record(line)
+            if only_author is not None and record['author'] not in (None, only_author):
+                raise ValueError('can only import your own posts')
+            pending.append((lineno, record))
+        except ValueError as exc:
+            rejected.append({'line': lineno, 'error': str(exc)})
+        if len(pending) + len(rejected) >= batch_size:
+            yield flush(number, pending, rejected, started)
+            number, pending, rejected = number + 1, [], []
+            started = time.perf_counter()
+
+    if pending or rejected:
+        yield flush(number, pending, rejected, started)
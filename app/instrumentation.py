@@ -0,0 +1,162 @@
+# app/instrumentation.py
+
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from app import db, rendering
+
+# Latency histogram buckets (seconds), Prometheus style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metrics:
+    """Per-process request/SQL/template/Markdown counters.
+
+    Each gunicorn worker keeps its own numbers; scrape every worker or sum
+    them in Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)          # (endpoint, method, status) -> count
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))  # endpoint -> cumulative counts
+        self.latency_sum = defaultdict(float)     # endpoint -> seconds
+        self.latency_count = defaultdict(int)     # endpoint -> requests
+        self.sql_statements = defaultdict(int)    # endpoint -> statements
+        self.sql_seconds = defaultdict(float)     # endpoint -> seconds
+        self.template_seconds = defaultdict(float)
+        self.markdown_seconds = defaultdict(float)
+
+    def observe(self, endpoint, method, status, timings):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            elapsed = timings['total']
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    self.buckets[endpoint][i] += 1
+            self.latency_sum[endpoint] += elapsed
+            self.latency_count[endpoint] += 1
+            self.sql_statements[endpoint] += timings['sql_count']
+            self.sql_seconds[endpoint] += timings['sql']
+            self.template_seconds[endpoint] += timings['template']
+            self.markdown_seconds[endpoint] += timings['markdown']
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def family(name, kind, help):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('microblog_requests_total', 'counter', 'HTTP requests handled.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'microblog_requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            family('microblog_request_duration_seconds', 'histogram', 'Request latency.')
+            for endpoint in sorted(self.latency_count):
+                for bound, count in zip(BUCKETS, self.buckets[endpoint]):
+                    lines.append(f'microblog_request_duration_seconds_bucket{{endpoint="{endpoint}",'
+                                 f'le="{bound}"}} {count}')
+                lines.append(f'microblog_request_duration_seconds_bucket{{endpoint="{endpoint}",'
+                             f'le="+Inf"}} {self.latency_count[endpoint]}')
+                lines.append(f'microblog_request_duration_seconds_sum{{endpoint="{endpoint}"}} '
+                             f'{self.latency_sum[endpoint]:.6f}')
+                lines.append(f'microblog_request_duration_seconds_count{{endpoint="{endpoint}"}} '
+                             f'{self.latency_count[endpoint]}')
+
+            for name, help, values, fmt in (
+                ('microblog_sql_statements_total', 'SQL statements executed.', self.sql_statements, '{}'),
+                ('microblog_sql_seconds_total', 'Time spent in SQL.', self.sql_seconds, '{:.6f}'),
+                ('microblog_template_seconds_total', 'Time spent rendering templates.',
+                 self.template_seconds, '{:.6f}'),
+                ('microblog_markdown_seconds_total', 'Time spent rendering Markdown.',
+                 self.markdown_seconds, '{:.6f}'),
+            ):
+                family(name, 'counter', help)
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# -------------------------
+# Per-request timers
+# -------------------------
+def _timings():
+    return g.get('timings') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start'].pop()
+    timings = _timings()
+    if timings is not None:
+        timings['sql'] += time.perf_counter() - started
+        timings['sql_count'] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.setdefault('template_start', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings.get('template_start'):
+        timings['template'] += time.perf_counter() - timings['template_start'].pop()
+
+
+def _markdown_rendered(seconds):
+    timings = _timings()
+    if timings is not None:
+        timings['markdown'] += seconds
+
+
+def init_app(app):
+    """Wire up instrumentation when METRICS_ENABLED; otherwise add nothing."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+
+    with app.app_context():
+        for engine in db.engines.values():  # primary and any read replicas
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    rendering.on_render = _markdown_rendered
+
+    @app.before_request
+    def start_timer():
+        g.timings = {'start': time.perf_counter(), 'sql': 0.0, 'sql_count': 0,
+                     'template': 0.0, 'markdown': 0.0}
+
+    @app.after_request
+    def record(response):
+        timings = g.pop('timings', None)
+        if timings is None or request.endpoint == 'metrics':
+            return response
+        timings['total'] = time.perf_counter() - timings['start']
+        metrics.observe(request.endpoint or 'unmatched', request.method, response.status_code, timings)
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={timings["total"] * 1000:.1f}',
+            f'db;dur={timings["sql"] * 1000:.1f};desc="{timings["sql_count"]} queries"',
+            f'tpl;dur={timings["template"] * 1000:.1f}',
+            f'md;dur={timings["markdown"] * 1000:.1f}',
+        ])
+        return response
+
+    def metrics_view():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
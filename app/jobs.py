@@ -0,0 +1,228 @@
+# app/jobs.py
+
+import json
+import logging
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from app import db
+from app.feed import refresh_feed_ids
+from app.models import Job, Post
+from app.profiles import adjust_tag_usage
+from app.tags import adjust_tag_counts, normalize_tag_names, resolve_tag_map
+from app.timeline import push_posts
+
+log = logging.getLogger(__name__)
+
+# Side effects of writes go through a small database-backed queue, so a
+# request only pays for its primary insert. Jobs are written in the same
+# transaction as the change that caused them (no lost or phantom jobs) and
+# picked up by `flask worker`. With JOBS_ASYNC off (the default), enqueue()
+# runs the handler inline instead, so dev setups and tests need no worker.
+#
+# Jobs sharing an idempotency key collapse into one pending job carrying the
+# latest payload. Handlers take a list of payloads, and the worker hands
+# each handler every claimed job of its kind at once.
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register `fn(payloads)` as the handler for jobs of `kind`."""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+# -------------------------
+# Enqueueing
+# -------------------------
+def _upsert(row):
+    dialect = db.session.get_bind(mapper=Job.__mapper__).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        # No portable upsert: update a pending twin, else insert in a savepoint
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Job), row)
+        except IntegrityError:
+            db.session.execute(
+                update(Job).where(Job.idempotency_key == row['idempotency_key'], Job.status == 'pending')
+                .values(payload=row['payload'])
+            )
+        return
+    stmt = upsert(Job).values(row)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['idempotency_key'], index_where=Job.status == 'pending',
+        set_={'payload': stmt.excluded.payload},
+    ))
+
+
+def enqueue(kind, payload, key=None):
+    """Queue a job in the current transaction (or run it now if JOBS_ASYNC is off)."""
+    if not current_app.config['JOBS_ASYNC']:
+        HANDLERS[kind]([payload])
+        return
+    row = {'kind': kind, 'payload': json.dumps(payload), 'idempotency_key': key,
+           'status': 'pending', 'attempts': 0, 'run_after': datetime.utcnow(),
+           'created_at': datetime.utcnow()}
+    if key is None:
+        db.session.execute(insert(Job), row)
+    else:
+        _upsert(row)
+
+
+# -------------------------
+# Worker
+# -------------------------
+def _claimable(now):
+    stale = now - timedelta(seconds=current_app.config['JOBS_LOCK_TIMEOUT'])
+    return or_(
+        and_(Job.status == 'pending', Job.run_after <= now),
+        # a worker died mid-batch; take its jobs over
+        and_(Job.status == 'running', Job.locked_at < stale),
+    )
+
+
+def claim(batch_size, worker_id):
+    """Mark up to batch_size runnable jobs as ours and return them."""
+    now = datetime.utcnow()
+    ids = db.session.scalars(
+        select(Job.id).where(_claimable(now)).order_by(Job.id).limit(batch_size)
+    ).all()
+    if not ids:
+        db.session.rollback()
+        return []
+    # Re-checking the condition makes a race with another worker harmless
+    db.session.execute(
+        update(Job).where(Job.id.in_(ids), _claimable(now))
+        .values(status='running', locked_by=worker_id, locked_at=now),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    return db.session.scalars(
+        select(Job).where(Job.id.in_(ids), Job.locked_by == worker_id, Job.status == 'running')
+        .order_by(Job.id)
+    ).all()
+
+
+def _fail(job, error):
+    max_attempts = current_app.config['JOBS_MAX_ATTEMPTS']
+    job.attempts += 1
+    job.last_error = error
+    job.locked_by = job.locked_at = None
+    if job.attempts >= max_attempts:
+        job.status = 'failed'
+        log.error('job %s (%s) failed for good after %d attempts', job.id, job.kind, job.attempts)
+        return
+    superseded = job.idempotency_key is not None and db.session.scalar(
+        select(Job.id).where(Job.idempotency_key == job.idempotency_key, Job.status == 'pending')
+    )
+    if superseded:
+        db.session.delete(job)  # a newer pending job will redo the work
+        return
+    job.status = 'pending'
+    job.run_after = datetime.utcnow() + timedelta(
+        seconds=current_app.config['JOBS_RETRY_DELAY'] * 2 ** (job.attempts - 1))
+
+
+def _run_group(kind, jobs):
+    """Run one handler call for `jobs`; returns how many completed.
+
+    Completed jobs are deleted in the same commit as the handler's changes.
+    """
+    ids = [job.id for job in jobs]
+    payloads = [json.loads(job.payload) for job in jobs]
+    try:
+        HANDLERS[kind](payloads)
+        db.session.execute(delete(Job).where(Job.id.in_(ids)))
+        db.session.commit()
+        return len(ids)
+    except Exception:
+        db.session.rollback()
+        if len(ids) > 1:
+            # Find the bad apple: retry one by one so the good jobs still complete
+            return sum(_run_group(kind, [db.session.get(Job, id)]) for id in ids)
+        log.exception('job %s (%s) failed', ids[0], kind)
+        _fail(db.session.get(Job, ids[0]), traceback.format_exc(limit=5))
+        db.session.commit()
+        return 0
+
+
+def run_batch(jobs):
+    """Run claimed jobs, one handler call per kind. Returns (done, failed)."""
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+    done = 0
+    for kind, group in by_kind.items():
+        if kind in HANDLERS:
+            done += _run_group(kind, group)
+            continue
+        for job in group:
+            _fail(job, f'no handler for job kind {kind!r}')
+        db.session.commit()
+    return done, len(jobs) - done
+
+
+def work(batch_size=100, poll_interval=1.0, once=False):
+    """Claim and run jobs until interrupted (or until the queue is empty, if `once`)."""
+    worker_id = uuid.uuid4().hex
+    total = 0
+    while True:
+        jobs = claim(batch_size, worker_id)
+        if not jobs:
+            if once:
+                return total
+            time.sleep(poll_interval)
+            continue
+        done, _ = run_batch(jobs)
+        total += done
+
+
+# -------------------------
+# Post write side effects
+# -------------------------
+@handler('post-written')
+def process_post_writes(payloads):
+    """Tags, Markdown, tag counts and usage, feed cards and timelines for new or edited posts.
+
+    Payloads are {'post_id': id, 'tags': [names] or None (unchanged)}. Posts
+    are read fresh, so a job that runs late still renders the latest edit.
+    """
+    ids = [payload['post_id'] for payload in payloads]
+    posts = {post.id: post for post in db.session.scalars(
+        select(Post).options(selectinload(Post.tags)).where(Post.id.in_(ids)))}
+    tag_map = resolve_tag_map({name for payload in payloads for name in payload.get('tags') or ()})
+
+    added, removed = [], []
+    for payload in payloads:
+        post = posts.get(payload['post_id'])
+        if post is None:
+            continue  # deleted since
+        if payload.get('tags') is not None:
+            old = {tag.id for tag in post.tags}
+            post.tags = [tag_map[name] for name in normalize_tag_names(payload['tags'])]
+            new = {tag.id for tag in post.tags}
+            added += [(post.user_id, tag_id) for tag_id in new - old]
+            removed += [(post.user_id, tag_id) for tag_id in old - new]
+        post.render()
+
+    db.session.flush()
+    adjust_tag_counts((tag_id for _, tag_id in added), (tag_id for _, tag_id in removed))
+    adjust_tag_usage(added, removed)
+    refresh_feed_ids(posts.keys())
+    # Cache-only; if the transaction rolls back, timeline reads skip the unknown ids.
+    # Under `flask worker` there are no cached timelines to push into: the web
+    # workers pick these posts up from their timelines' watermarks on next read.
+    push_posts((post.id, post.user_id, post.timestamp) for post in posts.values())
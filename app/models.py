@@ -1,9 +1,24 @@
 # app/models.py
 
 from datetime import datetime
-from app import db, login
+from app import db, login, rendering, security
+from app.cache import LRUCache
+from app.rendering import html_cache, render_markdown, content_hash
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from markupsafe import Markup
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+
+# ====================
+# FOLLOW GRAPH
+# ====================
+# (follower_id, followed_id) primary key serves "who do I follow" for
+# timelines; the reverse index serves "who follows this author" for fan-out.
+followers = db.Table('followers',
+    db.Column('follower_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('followed_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_followers_followed_id_follower_id', 'followed_id', 'follower_id')
+)
 
 # ====================
 # USER MODEL
@@ -12,31 +27,115 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    posts = db.relationship('Post', backref='author', lazy='dynamic')
+    # scrypt hashes are ~160 characters; headroom for stronger parameters
+    password_hash = db.Column(db.String(256))
+    # Denormalised number of followers, see timeline.refresh_follower_count()
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Profile header rollups, see profiles.posts_added()
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_post_at = db.Column(db.DateTime)
+    posts = db.relationship('Post', back_populates='author', lazy='dynamic')
+    followed = db.relationship(
+        'User', secondary=followers,
+        primaryjoin=lambda: followers.c.follower_id == User.id,
+        secondaryjoin=lambda: followers.c.followed_id == User.id,
+        lazy='dynamic', passive_deletes=True,
+    )
 
+    # Hash parameters and the hashing thread pool live in app/security.py
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = security.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return security.verify_password(self.password_hash, password)
+
+
+# ====================
+# LOGIN SESSION USER
+# ====================
+class SessionUser:
+    """Read-only stand-in for the logged-in User, built from one cached row.
+
+    Carries just what templates and views use (id, username, email) and the
+    Flask-Login interface. Load the ORM User when you need to change it.
+    """
+    __slots__ = ('id', 'username', 'email')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, (SessionUser, User)) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<SessionUser {self.username}>'
+
+
+# user id -> SessionUser; saves a query on every logged-in request.
+# Per process, so other workers see renames within USER_CACHE_TTL.
+user_cache = LRUCache(maxsize=1024, ttl=60)
+
 
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    id = int(id)
+    user = user_cache.get(id)
+    if user is None:
+        row = db.session.execute(
+            select(User.id, User.username, User.email).where(User.id == id)
+        ).first()
+        if row is None:
+            return None
+        user = SessionUser(*row)
+        user_cache.set(id, user)
+    return user
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _forget_session_user(mapper, connection, target):
+    user_cache.delete(target.id)
+
 
 # ====================
 # TAGGING SYSTEM
 # ====================
 # Many-to-many relationship table
+# (post_id, tag_id) primary key serves "tags of a post"; the reverse index
+# serves "posts with a tag" on tag pages.
 post_tags = db.Table('post_tags',
-    db.Column('post_id', db.Integer, db.ForeignKey('post.id')),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'))
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id')
 )
 
 class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True, nullable=False)
+    # Denormalised number of posts with this tag, see tags.adjust_tag_counts()
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+
+# How many of each author's posts carry each tag (profile "top tags"),
+# see profiles.adjust_tag_usage()
+user_tags = db.Table('user_tag_usage',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('post_count', db.Integer, nullable=False),
+    db.Index('ix_user_tag_usage_user_id_post_count', 'user_id', 'post_count')
+)
 
 # ====================
 # POST MODEL (SINGLE, MERGED)
@@ -48,12 +147,84 @@ class Post(db.Model):
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    # Per-author newest-first scans for timelines: user_id IN (...) ORDER BY timestamp.
+    # AUTOINCREMENT on SQLite: archived posts keep their ids, so ids are never reused.
+    __table_args__ = (
+        db.Index('ix_post_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    # Rendered Markdown, refreshed on write so read paths never parse Markdown.
+    # The HTML is deferred and served through rendering.html_cache (see `html`).
+    content_hash = db.Column(db.String(40))
+    content_html = db.deferred(db.Column(db.Text))
+
+    # Stored counters, recounted in the writing transaction (see app/comments.py)
+    # so cards show them without touching comment or reaction rows
+    likes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    dislikes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Bumped on every change to the post, its tags or its counters; keys the
+    # encoded API payloads in app/serializers.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    author = db.relationship('User', back_populates='posts')
+
     # Relationship with tags (many-to-many)
     tags = db.relationship('Tag', secondary=post_tags, backref='posts')
 
+    # Query, never a list: use comments.comment_page() to show them
+    comments = db.relationship('Comment', back_populates='post', lazy='dynamic',
+                               passive_deletes=True)
+
+    # ArchivedPost says True; templates hide write controls on archived posts
+    archived = False
+
     def __repr__(self):
         return f'<Post {self.title}>'
 
+    def render(self):
+        """Re-render the Markdown body if it changed since the last render."""
+        digest = content_hash(self.content)
+        if digest != self.content_hash:
+            self.content_html = render_markdown(self.content)
+            self.content_hash = digest
+            html_cache.delete(self.id)
+
+    @property
+    def html(self):
+        if not rendering.cache_enabled:
+            return Markup(render_markdown(self.content))
+        cached = html_cache.get(self.id)
+        if cached and cached[0] == self.content_hash:
+            return Markup(cached[1])
+        if self.content_hash is None:
+            html = render_markdown(self.content)  # not backfilled yet
+        else:
+            html = self.content_html
+        html_cache.set(self.id, (self.content_hash, html))
+        return Markup(html)
+
+    @staticmethod
+    def prime_html(posts):
+        """Load rendered HTML for every cache miss in `posts` with one query."""
+        if not rendering.cache_enabled:
+            return
+        missing = {}
+        for post in posts:
+            cached = html_cache.get(post.id)
+            if post.content_hash and not (cached and cached[0] == post.content_hash):
+                missing[post.id] = post.content_hash
+        if not missing:
+            return
+        rows = db.session.execute(
+            select(Post.id, Post.content_html).where(Post.id.in_(missing))
+        )
+        for id, html in rows:
+            if html is not None:
+                html_cache.set(id, (missing[id], html))
+
     def to_dict(self):
      return {
         'id': self.id,
@@ -61,7 +232,163 @@ class Post(db.Model):
         'content': self.content,
         'author': self.author.username if self.author else None,
         'tags': [tag.name for tag in self.tags],
+        'likes': self.likes,
+        'dislikes': self.dislikes,
+        'comment_count': self.comment_count,
         'timestamp': self.timestamp.isoformat() if self.timestamp else None
     }
 
 
+# Also fires for tag-only changes, which don't touch any post column.
+# Incremented in SQL so two concurrent writers can't both claim one version.
+@event.listens_for(Post, 'before_update')
+def _bump_post_version(mapper, connection, target):
+    if object_session(target).is_modified(target):
+        target.version = Post.version + 1
+
+
+# ====================
+# COMMENTS & REACTIONS
+# ====================
+class Comment(db.Model):
+    # Never reuse ids either; see Post
+    __table_args__ = (
+        db.Index('ix_comment_post_id_timestamp', 'post_id', 'timestamp', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    body = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+
+    author = db.relationship('User')
+    post = db.relationship('Post', back_populates='comments')
+
+
+# One like (+1) or dislike (-1) per user and post
+reactions = db.Table('reaction',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('value', db.SmallInteger, nullable=False),
+    db.Index('ix_reaction_post_id_value', 'post_id', 'value')
+)
+
+
+# ====================
+# ARCHIVE (COLD POSTS)
+# ====================
+# `flask archive-posts` moves old posts, with their tags, comments and
+# reactions, into these tables (see app/archive.py). Rows keep their ids,
+# so /post/<id> and tag pages find them; the hot tables stay small.
+post_tags_archive = db.Table('post_tags_archive',
+    db.Column('post_id', db.Integer, db.ForeignKey('post_archive.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_post_tags_archive_tag_id_post_id', 'tag_id', 'post_id')
+)
+
+
+class ArchivedPost(db.Model):
+    """A post moved out of `post`; read-only, same id and columns."""
+    __tablename__ = 'post_archive'
+    __table_args__ = (
+        db.Index('ix_post_archive_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_post_archive_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(140), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    content_hash = db.Column(db.String(40))
+    content_html = db.Column(db.Text)  # not deferred: archived posts are read one at a time
+    likes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    dislikes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    author = db.relationship('User')
+    tags = db.relationship('Tag', secondary=post_tags_archive)
+
+    archived = True
+    html = Post.html
+    to_dict = Post.to_dict
+
+    def __repr__(self):
+        return f'<ArchivedPost {self.title}>'
+
+
+class ArchivedComment(db.Model):
+    __tablename__ = 'comment_archive'
+    __table_args__ = (db.Index('ix_comment_archive_post_id_timestamp', 'post_id', 'timestamp', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    body = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post_archive.id', ondelete='CASCADE'), nullable=False)
+
+    author = db.relationship('User')
+
+
+reactions_archive = db.Table('reaction_archive',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post_archive.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('value', db.SmallInteger, nullable=False)
+)
+
+
+class PostMonth(db.Model):
+    """Posts per calendar month, hot and archived (see archive.adjust_month_counts())."""
+    __tablename__ = 'post_month'
+
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    post_count = db.Column(db.Integer, nullable=False)
+
+
+# ====================
+# MATERIALISED HOME FEED
+# ====================
+class FeedItem(db.Model):
+    """Pre-rendered card for one of the newest posts (see app/feed.py)."""
+    __tablename__ = 'feed_item'
+    __table_args__ = (db.Index('ix_feed_item_timestamp_id', 'timestamp', 'id'),)
+
+    # Same id as the post, so templates can treat items and posts alike
+    id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    card_html = db.Column(db.Text, nullable=False)
+
+    # Live counters, not stored here; filled per page by feed.load_counters()
+    likes = dislikes = comment_count = 0
+
+
+# ====================
+# BACKGROUND JOBS
+# ====================
+class Job(db.Model):
+    """Queued side effect of a write, run by `flask worker` (see app/jobs.py)."""
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+        # At most one *pending* job per key; a running job may have a pending successor
+        db.Index('uq_job_pending_key', 'idempotency_key', unique=True,
+                 sqlite_where=db.text("status = 'pending'"),
+                 postgresql_where=db.text("status = 'pending'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    idempotency_key = db.Column(db.String(191))
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending/running/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(32))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
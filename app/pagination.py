@@ -0,0 +1,69 @@
+# app/pagination.py
+
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+# -------------------------
+# Keyset (timestamp, id) cursors
+# -------------------------
+# A cursor is an opaque, URL-safe token pointing at the last row of a page.
+# The next page is everything strictly "older" than that row, so the query
+# walks the timestamp index instead of scanning OFFSET rows.
+
+def encode_cursor(timestamp, id):
+    raw = f'{timestamp.isoformat()}|{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) for a cursor, or raise ValueError if malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        timestamp, id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from exc
+
+
+def older_than(stmt, cursor, timestamp_col, id_col):
+    """Restrict a newest-first select to rows after the given cursor."""
+    timestamp, id = decode_cursor(cursor)
+    return stmt.where(tuple_(timestamp_col, id_col) < tuple_(timestamp, id))
+
+
+# -------------------------
+# Page of pre-fetched results
+# -------------------------
+class Page:
+    """Minimal stand-in for Flask-SQLAlchemy's Pagination, for results that
+    don't come from a single query (search hits, materialised lists).
+    """
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
@@ -0,0 +1,180 @@
+# app/profiles.py
+
+from collections import Counter
+
+from sqlalchemy import case, delete, func, insert, select, tuple_, union_all, update
+from sqlalchemy.orm import joinedload, selectinload
+from app import db
+from app.models import ArchivedPost, Post, Tag, User, post_tags, post_tags_archive, user_tags
+from app.pagination import encode_cursor, older_than
+
+# Author profile pages. The header numbers (posts, last post, tags used)
+# are rollups stored on `user` and in `user_tag_usage`, moved by +1/-1 as
+# an author's posts are written, so a profile view runs no aggregates. The
+# post list is a keyset walk of the (user_id, timestamp, id) indexes of
+# the hot and archive tables.
+
+
+def _last_post_at():
+    # Archived posts still count as the author's; see app/archive.py
+    return func.coalesce(
+        select(func.max(Post.timestamp)).where(Post.user_id == User.id).scalar_subquery(),
+        select(func.max(ArchivedPost.timestamp)).where(ArchivedPost.user_id == User.id).scalar_subquery(),
+    )
+
+
+def posts_added(posts):
+    """Count new posts, given as (author id, timestamp) pairs, into their authors' rollups."""
+    newest, added = {}, Counter()
+    for user_id, timestamp in posts:
+        if user_id is None:
+            continue
+        added[user_id] += 1
+        if user_id not in newest or timestamp > newest[user_id]:
+            newest[user_id] = timestamp
+    for user_id, count in added.items():
+        timestamp = newest[user_id]
+        db.session.execute(
+            update(User).where(User.id == user_id).values(
+                post_count=User.post_count + count,
+                last_post_at=case((User.last_post_at >= timestamp, User.last_post_at), else_=timestamp),
+            ),
+            execution_options={'synchronize_session': False},
+        )
+
+
+def post_deleted(user_id, timestamp):
+    """Take a deleted post out of its author's rollups; call after the delete is flushed.
+
+    last_post_at is only looked up again when the deleted post was the newest.
+    """
+    if user_id is None:
+        return
+    db.session.execute(
+        update(User).where(User.id == user_id).values(
+            post_count=User.post_count - 1,
+            last_post_at=case((User.last_post_at > timestamp, User.last_post_at), else_=_last_post_at()),
+        ),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def _add_usage(rows):
+    """Upsert user_tag_usage rows, adding their post_count to any existing one."""
+    dialect = db.session.get_bind(mapper=User.__mapper__).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        # No portable upsert: bump the row, insert it if there was none
+        for row in rows:
+            bumped = db.session.execute(
+                update(user_tags)
+                .where(user_tags.c.user_id == row['user_id'], user_tags.c.tag_id == row['tag_id'])
+                .values(post_count=user_tags.c.post_count + row['post_count'])
+            ).rowcount
+            if not bumped:
+                db.session.execute(insert(user_tags), row)
+        return
+    stmt = upsert(user_tags)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'tag_id'],
+        set_={'post_count': user_tags.c.post_count + stmt.excluded.post_count},
+    ), rows)
+
+
+def adjust_tag_usage(added=(), removed=()):
+    """Move user_tag_usage by +1 per (author id, tag id) in `added`, -1 per pair in `removed`.
+
+    The author-side twin of tags.adjust_tag_counts(); rows that reach zero
+    are dropped.
+    """
+    deltas = Counter((user_id, tag_id) for user_id, tag_id in added if user_id is not None)
+    deltas.subtract((user_id, tag_id) for user_id, tag_id in removed if user_id is not None)
+    rows = [{'user_id': user_id, 'tag_id': tag_id, 'post_count': delta}
+            for (user_id, tag_id), delta in deltas.items() if delta > 0]
+    if rows:
+        _add_usage(rows)
+    by_delta = {}
+    for pair, delta in deltas.items():
+        if delta < 0:
+            by_delta.setdefault(delta, []).append(pair)
+    for delta, pairs in by_delta.items():
+        which = tuple_(user_tags.c.user_id, user_tags.c.tag_id).in_(pairs)
+        db.session.execute(update(user_tags).where(which).values(post_count=user_tags.c.post_count + delta))
+        db.session.execute(delete(user_tags).where(which, user_tags.c.post_count <= 0))
+
+
+def refresh_author_stats(user_ids):
+    """Recount post_count/last_post_at and tag usage for the given authors.
+
+    Scans all of each author's posts and tag links; writes use posts_added(),
+    post_deleted() and adjust_tag_usage() instead. This is the repair path
+    behind `flask recount`.
+    """
+    user_ids = {id for id in user_ids if id is not None}
+    if not user_ids:
+        return
+    def own(model):
+        return model.user_id == User.id
+
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids)).values(
+            post_count=select(func.count()).select_from(Post).where(own(Post)).scalar_subquery()
+            + select(func.count()).select_from(ArchivedPost).where(own(ArchivedPost)).scalar_subquery(),
+            last_post_at=_last_post_at(),
+        ),
+        execution_options={'synchronize_session': False},
+    )
+    links = union_all(
+        select(Post.user_id, post_tags.c.tag_id)
+        .join(post_tags, post_tags.c.post_id == Post.id)
+        .where(Post.user_id.in_(user_ids)),
+        select(ArchivedPost.user_id, post_tags_archive.c.tag_id)
+        .join(post_tags_archive, post_tags_archive.c.post_id == ArchivedPost.id)
+        .where(ArchivedPost.user_id.in_(user_ids)),
+    ).subquery()
+    db.session.execute(delete(user_tags).where(user_tags.c.user_id.in_(user_ids)))
+    db.session.execute(insert(user_tags).from_select(
+        ['user_id', 'tag_id', 'post_count'],
+        select(links.c.user_id, links.c.tag_id, func.count())
+        .group_by(links.c.user_id, links.c.tag_id),
+    ))
+
+
+def top_tags(user_id, limit):
+    """(Tag, uses) pairs for the author's most used tags, biggest first."""
+    return db.session.execute(
+        select(Tag, user_tags.c.post_count)
+        .join(user_tags, user_tags.c.tag_id == Tag.id)
+        .where(user_tags.c.user_id == user_id)
+        .order_by(user_tags.c.post_count.desc(), Tag.name)
+        .limit(limit)
+    ).all()
+
+
+def _newest_by(model, user_id, cursor, limit):
+    stmt = (
+        select(model).options(joinedload(model.author), selectinload(model.tags))
+        .where(model.user_id == user_id)
+        .order_by(model.timestamp.desc(), model.id.desc())
+    )
+    if cursor:
+        stmt = older_than(stmt, cursor, model.timestamp, model.id)
+    return db.session.scalars(stmt.limit(limit)).all()
+
+
+def author_posts(user_id, cursor, per_page):
+    """One page of the author's posts, hot and archived, newest first.
+
+    Returns (posts, next cursor). Raises ValueError for a malformed cursor.
+    """
+    posts = (_newest_by(Post, user_id, cursor, per_page + 1)
+             + _newest_by(ArchivedPost, user_id, cursor, per_page + 1))
+    posts.sort(key=lambda post: (post.timestamp, post.id), reverse=True)
+    next_cursor = None
+    if len(posts) > per_page:
+        posts = posts[:per_page]
+        next_cursor = encode_cursor(posts[-1].timestamp, posts[-1].id)
+    return posts, next_cursor
@@ -0,0 +1,57 @@
+# app/rendering.py
+
+import hashlib
+import threading
+import time
+import markdown
+from markupsafe import Markup
+from app.cache import LRUCache
+
+MARKDOWN_EXTENSIONS = ["fenced_code"]
+
+# post id -> (content_hash, html), sits in front of the persisted Post.content_html
+html_cache = LRUCache(maxsize=2048)
+cache_enabled = True
+
+
+# Called with the seconds each render took (set by app.instrumentation)
+on_render = None
+
+
+# markdown.markdown() builds a new converter (and loads its extensions) on
+# every call. A Markdown instance can be reset and reused, but not shared
+# between threads, so each thread keeps its own.
+_local = threading.local()
+
+
+def converter():
+    md = getattr(_local, 'converter', None)
+    if md is None:
+        md = _local.converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md
+
+
+def render_markdown(text):
+    if on_render is None:
+        return converter().reset().convert(text or '')
+    started = time.perf_counter()
+    html = converter().reset().convert(text or '')
+    on_render(time.perf_counter() - started)
+    return html
+
+
+def content_hash(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def init_app(app):
+    global cache_enabled
+    cache_enabled = app.config['MARKDOWN_CACHE_ENABLED']
+    html_cache.maxsize = app.config['MARKDOWN_CACHE_SIZE']
+    html_cache.clear()
+
+    # Markdown filter for Jinja2 templates (ad-hoc text; posts use post.html)
+    @app.template_filter('markdown')
+    def markdown_filter(text):
+        # Convert Markdown to HTML safely
+        return Markup(render_markdown(text))
@@ -0,0 +1,84 @@
+# app/replicas.py
+
+import random
+import time
+
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Routes reads to read replicas configured as binds (see Config). The rules,
+# checked on every statement:
+#
+# * only plain SELECTs (no FOR UPDATE) in GET/HEAD/OPTIONS requests go to a
+#   replica; CLI commands, workers and form posts always use the primary;
+# * once a session has written (flush or Core INSERT/UPDATE/DELETE), it
+#   reads from the primary until it ends, so it sees its own changes;
+# * a visitor who wrote in a recent request reads from the primary for
+#   DB_PRIMARY_STICKY_SECONDS (tracked in their Flask session), which covers
+#   the redirect after a form post.
+#
+# Other visitors may read a lagging replica for a moment; the response cache
+# doesn't store pages for DB_PRIMARY_STICKY_SECONDS after a change, so a
+# stale page can't outlive that moment (see app/response_cache.py).
+#
+# One replica is picked per session so a request sees a single snapshot.
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+STICKY_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and engine is self._db.engines.get(None) and self._read_from_replica(clause):
+            return self._db.engines[self._replica()]
+        return engine
+
+    def _read_from_replica(self, clause):
+        return (
+            getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None
+            and not self.info.get('wrote')
+            and has_request_context()
+            and request.method in SAFE_METHODS
+            and bool(current_app.config['DB_READ_REPLICAS'])
+            and session.get(STICKY_KEY, 0) < time.time()
+        )
+
+    def _replica(self):
+        if 'replica' not in self.info:
+            self.info['replica'] = random.choice(current_app.config['DB_READ_REPLICAS'])
+        return self.info['replica']
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _note_write(orm_execute_state):
+    # Anything but a SELECT (DML, raw SQL) pins the session to the primary
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_flush(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+def init_app(app):
+    if not app.config['DB_READ_REPLICAS']:
+        return
+    from app import db
+
+    @app.before_request
+    def start_on_replica():
+        # Sessions normally end with the request; a test client reusing one
+        # app context must not carry the previous request's write over
+        db.session.info.pop('wrote', None)
+        db.session.info.pop('replica', None)
+
+    @app.after_request
+    def stick_to_primary(response):
+        if db.session.info.get('wrote') and request.method not in SAFE_METHODS:
+            session[STICKY_KEY] = time.time() + app.config['DB_PRIMARY_STICKY_SECONDS']
+        return response
@@ -0,0 +1,189 @@
+# app/response_cache.py
+
+import hashlib
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Response, current_app, g, request, session
+from flask_login import current_user
+from app.cache import LRUCache
+from app.signals import post_counts_changed, posts_changed
+
+# Anonymous GET pages served from the cache
+CACHEABLE_ENDPOINTS = {'main.index', 'main.tag_filter', 'main.post_detail', 'main.tag_cloud',
+                       'main.archive_index', 'main.archive_month'}
+
+# Response headers kept with a cached page
+STORED_HEADERS = ('Content-Type', 'Content-Language')
+
+
+# -------------------------
+# Backends
+# -------------------------
+# A backend stores pickled entries and a "generation" number. Every key
+# includes the generation, so bumping it invalidates the whole cache at once;
+# old entries simply age out. It also keeps the time of the last change
+# (bump or touch), which pages rendered afterwards send as Last-Modified.
+
+class MemoryBackend:
+    """Per-process LRU with TTL. Each gunicorn worker has its own copy, so a
+    write seen by one worker reaches the others when their entries expire."""
+
+    def __init__(self, app):
+        self._cache = LRUCache(maxsize=app.config['RESPONSE_CACHE_SIZE'],
+                               ttl=app.config['RESPONSE_CACHE_TTL'])
+        self._generation = 0
+        self._bumped_at = 0
+        self._changed_at = time.time()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def generation(self):
+        return self._generation
+
+    def state(self):
+        """(generation, bumped_at, changed_at), read together."""
+        with self._lock:
+            return self._generation, self._bumped_at, self._changed_at
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+            self._bumped_at = self._changed_at = time.time()
+
+    def touch(self):
+        with self._lock:
+            self._changed_at = time.time()
+
+
+class RedisBackend:
+    """Shared store for all workers and hosts (needs the `redis` package)."""
+
+    def __init__(self, app):
+        import redis
+        self._redis = redis.Redis.from_url(app.config['RESPONSE_CACHE_REDIS_URL'])
+        self._ttl = app.config['RESPONSE_CACHE_TTL']
+        self._prefix = 'microblog:response:'
+        # first worker up starts the clock
+        self._redis.set(self._prefix + 'changed-at', time.time(), nx=True)
+
+    def get(self, key):
+        return self._redis.get(self._prefix + key)
+
+    def set(self, key, value):
+        self._redis.set(self._prefix + key, value, ex=self._ttl)
+
+    def generation(self):
+        return int(self._redis.get(self._prefix + 'generation') or 0)
+
+    def state(self):
+        generation, bumped_at, changed_at = self._redis.mget(
+            *(self._prefix + name for name in ('generation', 'bumped-at', 'changed-at')))
+        return int(generation or 0), float(bumped_at or 0), float(changed_at or 0)
+
+    def bump_generation(self):
+        now = time.time()
+        with self._redis.pipeline() as pipe:
+            pipe.incr(self._prefix + 'generation')
+            pipe.mset({self._prefix + 'bumped-at': now, self._prefix + 'changed-at': now})
+            pipe.execute()
+
+    def touch(self):
+        self._redis.set(self._prefix + 'changed-at', time.time())
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'redis': RedisBackend,
+}
+
+
+# -------------------------
+# Request hooks
+# -------------------------
+def _cacheable():
+    return (
+        request.method == 'GET'
+        and request.endpoint in CACHEABLE_ENDPOINTS
+        # pending flash messages are per-visitor
+        and '_flashes' not in session
+        and not current_user.is_authenticated
+    )
+
+
+def init_app(app):
+    if not app.config['RESPONSE_CACHE_ENABLED']:
+        return
+    backend = BACKENDS[app.config['RESPONSE_CACHE_BACKEND']](app)
+    app.extensions['response_cache'] = backend
+    # Read replicas may not have the change behind a bump yet; a page
+    # rendered from one now would sit under the new generation until it
+    # expires. Pages aren't cached until replicas had time to catch up.
+    replica_lag = app.config['DB_PRIMARY_STICKY_SECONDS'] if app.config['DB_READ_REPLICAS'] else 0
+
+    @app.before_request
+    def serve_from_cache():
+        if not _cacheable():
+            return None
+        # Last-Modified is taken now, so a change during rendering can't
+        # stamp this page newer than its content
+        generation, bumped_at, changed_at = backend.state()
+        if time.time() < bumped_at + replica_lag:
+            return None
+        key = f'{generation}:{request.full_path}'
+        g.response_cache = (changed_at, key)
+        entry = backend.get(key)
+        if entry is None:
+            return None
+        body, headers, etag, last_modified = pickle.loads(entry)
+        response = Response(body, headers=headers)
+        _add_validators(response, etag, last_modified)
+        g.response_cache_hit = True
+        return response.make_conditional(request)
+
+    @app.after_request
+    def store_in_cache(response):
+        changed_at, key = g.pop('response_cache', (None, None))
+        if key is None or g.pop('response_cache_hit', False):
+            return response
+        if response.status_code != 200 or response.direct_passthrough or session.modified:
+            return response
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        last_modified = datetime.fromtimestamp(int(changed_at), timezone.utc)
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        backend.set(key, pickle.dumps((body, headers, etag, last_modified)))
+        _add_validators(response, etag, last_modified)
+        return response.make_conditional(request)
+
+
+@posts_changed.connect
+def _invalidate(sender):
+    backend = current_app.extensions.get('response_cache')
+    if backend is not None:
+        backend.bump_generation()
+
+
+@post_counts_changed.connect
+def _touch(sender):
+    # Cached pages stay until they expire; pages rendered after that get a
+    # newer Last-Modified, so If-Modified-Since clients see the new counts
+    backend = current_app.extensions.get('response_cache')
+    if backend is not None:
+        backend.touch()
+
+
+def _add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Shared caches must not hand an anonymous page to a logged-in user
+    response.vary.add('Cookie')
+    response.cache_control.no_cache = True
@@ -1,39 +1,161 @@
 # app/routes.py
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+import calendar
+
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, jsonify,
+                   current_app, Response, stream_with_context, abort, g)
 from flask_login import login_user, logout_user, current_user, login_required
-from app import db
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload, undefer
+from app import db, csrf, archive, comments, feed, jobs, profiles, security, serializers, syndication, timeline
 from app.models import User, Post, Tag
-from app.forms import LoginForm, SignupForm, PostForm
-import markdown
-from markupsafe import Markup
+from app.forms import LoginForm, SignupForm, PostForm, CommentForm
+from app.importer import import_posts, iter_lines
+from app.pagination import Page, encode_cursor, older_than
+from app.search import get_index
+from app.rendering import html_cache
+from app.tags import adjust_tag_counts, normalize_tag_names, top_tags
 
 main = Blueprint('main', __name__)
 
+
+# Link to another page of the current listing, keeping its URL args (e.g. ?q=)
+@main.app_template_global()
+def page_url(page):
+    args = dict(request.args.to_dict(), **request.view_args)
+    args['page'] = page
+    return url_for(request.endpoint, **args)
+
+
+# Ids of the authors the current user follows, looked up once per request
+@main.app_template_global()
+def following():
+    if 'following' not in g:
+        g.following = timeline.followed_ids(current_user.id) if current_user.is_authenticated else set()
+    return g.following
+
+
+# Everything a post card touches, loaded up front: the author is joined into
+# the post query and all tags for the page come from a single IN query.
+CARD_OPTIONS = (joinedload(Post.author), selectinload(Post.tags))
+
 # -------------------------
 # Home Page with Pagination
 # -------------------------
+# Served from the materialised feed (app/feed.py). ?before=<cursor> walks
+# back with keyset "older than" seeks; /page/<n> offsets stay cheap inside
+# the FEED_SIZE window and fall back to the post table beyond it.
 @main.route('/')
 @main.route('/page/<int:page>')
-def index():
-    page = request.args.get('page', 1, type=int)
-    pagination = Post.query.order_by(Post.timestamp.desc()).paginate(
-        page=page, per_page=5, error_out=False
-    )
-    posts = pagination.items
-    return render_template('index.html', posts=posts, pagination=pagination)
+def index(page=None):
+    per_page = current_app.config['POSTS_PER_PAGE']
+    before = request.args.get('before')
+    if before:
+        try:
+            posts, next_cursor = feed.older_than(before, per_page)
+        except ValueError:
+            abort(400)
+        pagination = None
+    else:
+        page = max(1, page or request.args.get('page', 1, type=int))
+        pagination = feed.feed_page(page, per_page)
+        posts = pagination.items
+        next_cursor = None
+        if pagination.has_next and posts:
+            next_cursor = encode_cursor(posts[-1].timestamp, posts[-1].id)
+    Post.prime_html([post for post in posts if isinstance(post, Post)])
+    feed.load_counters(posts)
+    return render_template('index.html', posts=posts, pagination=pagination, next_cursor=next_cursor)
 
 
 # -------------------
 # View Posts by Tag
 # -------------------
 @main.route('/tag/<string:tag_name>')
-def tag_filter(tag_name):
+@main.route('/tag/<string:tag_name>/page/<int:page>')
+def tag_filter(tag_name, page=None):
+    page = max(1, page or request.args.get('page', 1, type=int))
     tag = Tag.query.filter_by(name=tag_name).first_or_404()
-    posts = tag.posts
-    for post in posts:
-        post.content_html = Markup(markdown.markdown(post.content))
-    return render_template('index.html', posts=posts, tag=tag)
+    # Hot and archived posts together (app/archive.py), totalled from Tag.post_count
+    pagination = archive.tag_page(tag, page, current_app.config['POSTS_PER_PAGE'])
+    posts = pagination.items
+    Post.prime_html([post for post in posts if not post.archived])
+    return render_template('index.html', posts=posts, pagination=pagination, tag=tag)
+
+
+# -------------------
+# Archive by Month
+# -------------------
+# Month list and counts come from the post_month table; a month page reads
+# both the hot and archive tables' timestamp indexes.
+@main.route('/archive')
+def archive_index():
+    return render_template('archive.html', months=archive.months(), month_names=calendar.month_name)
+
+
+@main.route('/archive/<int:year>/<int:month>')
+@main.route('/archive/<int:year>/<int:month>/page/<int:page>')
+def archive_month(year, month, page=None):
+    if not (1 <= month <= 12 and 1 <= year <= 9999):
+        abort(404)
+    page = max(1, page or request.args.get('page', 1, type=int))
+    pagination = archive.month_page(year, month, page, current_app.config['POSTS_PER_PAGE'])
+    posts = pagination.items
+    Post.prime_html([post for post in posts if not post.archived])
+    return render_template('index.html', posts=posts, pagination=pagination,
+                           heading=f'{calendar.month_name[month]} {year}')
+
+
+# -------------------
+# Atom Feeds (cached, conditional; see app/syndication.py)
+# -------------------
+@main.route('/feed.atom')
+def atom_feed():
+    return syndication.feed_response()
+
+
+@main.route('/tag/<string:tag_name>/feed.atom')
+def tag_atom_feed(tag_name):
+    return syndication.feed_response(tag_name) or abort(404)
+
+
+# -------------------
+# Tag Cloud
+# -------------------
+@main.route('/tags')
+def tag_cloud():
+    limit = request.args.get('limit', current_app.config['TAG_CLOUD_SIZE'], type=int)
+    tags = top_tags(max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE'])))
+    return render_template('tags.html', tags=tags)
+
+
+# -------------------
+# Full-text Search
+# -------------------
+def _search_posts(index, query, page, per_page):
+    """Run a ranked search and load the hits' posts, best match first."""
+    hits, total = index.search(query, page=page, per_page=per_page)
+    ids = [post_id for post_id, _ in hits]
+    posts = {post.id: post for post in db.session.scalars(
+        select(Post).options(*CARD_OPTIONS).where(Post.id.in_(ids))
+    )} if ids else {}
+    return [(posts[post_id], rank) for post_id, rank in hits if post_id in posts], total
+
+
+@main.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = current_app.config['SEARCH_PER_PAGE']
+    index = get_index(current_app)
+    if index is None:
+        flash('Search is not available on this server.')
+        return render_template('index.html', posts=[], pagination=None, query=query), 503
+    results, total = _search_posts(index, query, page, per_page)
+    posts = [post for post, _ in results]
+    Post.prime_html(posts)
+    pagination = Page(posts, page, per_page, total)
+    return render_template('index.html', posts=posts, pagination=pagination, query=query)
 
 
 # -------------------
@@ -45,10 +167,19 @@ def login():
         return redirect(url_for("main.index"))
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
+        # Turn floods away before paying for a password hash
+        if not security.allow_login_attempt(form.username.data, request.remote_addr):
+            flash("Too many login attempts. Please wait a minute and try again.")
+            return render_template("login.html", form=form), 429, {
+                'Retry-After': str(security.login_limiter.retry_after())}
+        user = db.session.scalar(select(User).where(User.username == form.username.data))
         if user is None or not user.check_password(form.password.data):
+            security.login_failed(form.username.data, request.remote_addr)
             flash("Invalid username or password")
             return redirect(url_for("main.login"))
+        if security.needs_rehash(user.password_hash):
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user)
         return redirect(url_for("main.index"))
     return render_template("login.html", form=form)
@@ -81,6 +212,18 @@ def logout():
     return redirect(url_for("main.index"))
 
 
+# Everything after the primary write - tags, Markdown, tag counts, feed cards,
+# timelines - is a "post-written" job (app/jobs.py). Inline unless JOBS_ASYNC.
+# A new post's +1 on its author's and month's counts is cheap and done right here.
+def _post_written(post, tags, created=False):
+    db.session.flush()
+    if created:
+        profiles.posts_added([(post.user_id, post.timestamp)])
+        archive.adjust_month_counts([post.timestamp])
+    jobs.enqueue('post-written', {'post_id': post.id, 'tags': normalize_tag_names(tags)},
+                 key=f'post-written:{post.id}')
+
+
 # -------------------
 # Create Post (HTML Form)
 # -------------------
@@ -89,22 +232,9 @@ def logout():
 def create_post():
     form = PostForm()
     if form.validate_on_submit():
-        post = Post(title=form.title.data, content=form.content.data, author=current_user)
-
-        # Handle tags input (comma-separated)
-        tag_names = [t.strip() for t in form.tags.data.split(',')] if form.tags.data else []
-        tags = []
-        for name in tag_names:
-            if not name:
-                continue
-            tag = Tag.query.filter_by(name=name).first()
-            if not tag:
-                tag = Tag(name=name)
-                db.session.add(tag)
-            tags.append(tag)
-        post.tags = tags
-
+        post = Post(title=form.title.data, content=form.content.data, user_id=current_user.id)
         db.session.add(post)
+        _post_written(post, form.tags.data, created=True)
         db.session.commit()
         flash('Post created successfully!')
         return redirect(url_for('main.index'))
@@ -118,8 +248,8 @@ def create_post():
 @main.route('/edit/<int:post_id>', methods=['GET', 'POST'])
 @login_required
 def edit_post(post_id):
-    post = Post.query.get_or_404(post_id)
-    if post.author != current_user:
+    post = db.get_or_404(Post, post_id)
+    if post.user_id != current_user.id:
         flash("You can't edit this post.")
         return redirect(url_for('main.index'))
 
@@ -128,20 +258,8 @@ def edit_post(post_id):
     if form.validate_on_submit():
         post.title = form.title.data
         post.content = form.content.data
-
-        # Handle tags
-        tag_names = [t.strip() for t in form.tags.data.split(',')] if form.tags.data else []
-        tags = []
-        for name in tag_names:
-            if not name:
-                continue
-            tag = Tag.query.filter_by(name=name).first()
-            if not tag:
-                tag = Tag(name=name)
-                db.session.add(tag)
-            tags.append(tag)
-        post.tags = tags
-
+        post.content_hash = None  # shown rendered on the fly until the job re-renders it
+        _post_written(post, form.tags.data)
         db.session.commit()
         flash('Post updated successfully!')
         return redirect(url_for('main.index'))
@@ -154,56 +272,277 @@ def edit_post(post_id):
 # -------------------
 # Delete Post
 # -------------------
-@main.route('/delete/<int:post_id>', methods=['POST', 'GET'])
+@main.route('/delete/<int:post_id>', methods=['POST'])
 @login_required
 def delete_post(post_id):
-    post = Post.query.get_or_404(post_id)
-    if post.author != current_user:
+    post = db.get_or_404(Post, post_id)
+    if post.user_id != current_user.id:
         flash("You can't delete this post.")
         return redirect(url_for('main.index'))
 
+    tag_ids = [tag.id for tag in post.tags]
+    author_id = post.user_id
     db.session.delete(post)
+    db.session.flush()
+    adjust_tag_counts(removed=tag_ids)
+    profiles.post_deleted(author_id, post.timestamp)
+    profiles.adjust_tag_usage(removed=[(author_id, tag_id) for tag_id in tag_ids])
+    archive.adjust_month_counts(removed=[post.timestamp])
+    feed.remove_from_feed([post_id])
     db.session.commit()
+    html_cache.delete(post_id)
+    timeline.forget_author(author_id)
     flash('Post deleted successfully!')
     return redirect(url_for('main.index'))
 
 
+# -------------------
+# Follow Graph & Personal Timeline
+# -------------------
+@main.route('/user/<int:user_id>/follow', methods=['POST'])
+@login_required
+def follow(user_id):
+    user = db.get_or_404(User, user_id)
+    if timeline.follow(current_user.id, user.id):
+        db.session.commit()
+        flash(f'You are now following {user.username}.')
+    return redirect(url_for('main.user_timeline'))
+
+
+@main.route('/user/<int:user_id>/unfollow', methods=['POST'])
+@login_required
+def unfollow(user_id):
+    user = db.get_or_404(User, user_id)
+    if timeline.unfollow(current_user.id, user.id):
+        db.session.commit()
+        flash(f'You unfollowed {user.username}.')
+    return redirect(url_for('main.user_timeline'))
+
+
+# An author's posts, newest first (?before=<cursor>), under their stored stats
+@main.route('/user/<username>')
+def profile(username):
+    user = db.first_or_404(select(User).where(User.username == username))
+    try:
+        posts, next_cursor = profiles.author_posts(
+            user.id, request.args.get('before'), current_app.config['POSTS_PER_PAGE'])
+    except ValueError:
+        abort(400)
+    Post.prime_html([post for post in posts if not post.archived])
+    return render_template('profile.html', user=user, posts=posts, pagination=None,
+                           next_cursor=next_cursor, heading=user.username,
+                           top_tags=profiles.top_tags(user.id, current_app.config['PROFILE_TAGS']))
+
+
+# Your posts plus those of the people you follow, newest first (?before=<cursor>)
+@main.route('/feed')
+@login_required
+def user_timeline():
+    try:
+        posts, next_cursor = timeline.timeline_page(
+            current_user.id, request.args.get('before'), current_app.config['POSTS_PER_PAGE'])
+    except ValueError:
+        abort(400)
+    Post.prime_html(posts)
+    return render_template('index.html', posts=posts, pagination=None, next_cursor=next_cursor,
+                           heading='Your Feed')
+
+
 # -------------------------
 # REST API Endpoints (JSON)
 # -------------------------
 
-# Get all posts (JSON)
+# Newest-first (id, version) refs; payloads come from app/serializers.py
+def _api_posts_query():
+    return (
+        select(Post.id, Post.version, Post.timestamp)
+        .order_by(Post.timestamp.desc(), Post.id.desc())
+    )
+
+
+def _wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+# Serve a (id, version, timestamp) listing: JSON pages with ?limit=&cursor=,
+# trimmed with ?fields=id,title; ?format=ndjson streams every remaining post,
+# one JSON object per line. `extra` goes into the JSON page envelope.
+def _post_listing(stmt, **extra):
+    try:
+        fields = serializers.parse_fields(request.args.get('fields'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            stmt = older_than(stmt, cursor, Post.timestamp, Post.id)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    if _wants_ndjson():
+        limit = request.args.get('limit', type=int)
+        if limit:
+            stmt = stmt.limit(limit)
+        batch_size = current_app.config['API_STREAM_BATCH_SIZE']
+
+        # yield_per keeps a server-side cursor open and reads one batch of
+        # refs at a time, so a full export never holds the whole table in memory
+        def generate():
+            result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+            for refs in result.partitions():
+                yield b''.join(blob + b'\n' for blob in serializers.encode_posts(refs, fields))
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+    refs = db.session.execute(stmt.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(refs) > limit:
+        refs = refs[:limit]
+        next_cursor = encode_cursor(refs[-1].timestamp, refs[-1].id)
+
+    body = serializers.envelope('posts', serializers.encode_posts(refs, fields),
+                                next_cursor=next_cursor, **extra)
+    return Response(body, mimetype='application/json')
+
+
+# Get posts (JSON), newest first
 @main.route('/api/posts', methods=['GET'])
 def get_posts():
-    posts = Post.query.all()
-    return jsonify([post.to_dict() for post in posts])
+    return _post_listing(_api_posts_query())
+
+
+# One author's posts (JSON), newest first, with their profile rollups
+@main.route('/api/users/<username>/posts', methods=['GET'])
+def api_user_posts(username):
+    user = db.session.scalar(select(User).where(User.username == username))
+    if user is None:
+        return jsonify({'error': 'Unknown user'}), 404
+    summary = {
+        'username': user.username,
+        'post_count': user.post_count,
+        'last_post_at': user.last_post_at.isoformat() if user.last_post_at else None,
+        'follower_count': user.follower_count,
+        'top_tags': [{'name': tag.name, 'post_count': uses}
+                     for tag, uses in profiles.top_tags(user.id, current_app.config['PROFILE_TAGS'])],
+    }
+    return _post_listing(_api_posts_query().where(Post.user_id == user.id), user=summary)
 
 # Create a post via API
 @main.route('/api/posts', methods=['POST'])
+@csrf.exempt  # anonymous JSON API: no session to forge
 def api_create_post():  # ✅ Renamed to avoid conflict
     data = request.get_json()
     if not data or not all(k in data for k in ('title', 'content')):
         return jsonify({'error': 'Missing data'}), 400
 
+    tags = data.get('tags', [])
+    if not isinstance(tags, list):
+        return jsonify({'error': 'tags must be a list'}), 400
+
     user = User.query.first()  # TEMP: Assume first user is author
     post = Post(title=data['title'], content=data['content'], author=user)
-
-    # Handle tags
-    tag_names = data.get('tags', [])
-    for name in tag_names:
-        tag = Tag.query.filter_by(name=name).first()
-        if not tag:
-            tag = Tag(name=name)
-            db.session.add(tag)
-        post.tags.append(tag)
-
     db.session.add(post)
+    _post_written(post, tags, created=True)
     db.session.commit()
-    return jsonify(post.to_dict()), 201
+    # tags may still be queued for the worker; answer with what was asked for
+    return jsonify(dict(post.to_dict(), tags=normalize_tag_names(tags))), 201
+
 
 
+# Bulk-create posts from an NDJSON request body (one post.json object per line)
+# The logged-in user's own posts only; other "author" values are rejected
+@main.route('/api/posts/bulk', methods=['POST'])
+@login_required
+def api_bulk_import():
+    batch_size = request.args.get('batch_size', current_app.config['IMPORT_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, current_app.config['IMPORT_MAX_BATCH_SIZE']))
+
+    reports = list(import_posts(iter_lines(request.stream), batch_size=batch_size,
+                                default_author=current_user.id, only_author=current_user.username))
+    rejected = [reject for report in reports for reject in report['rejected']]
+    return jsonify({
+        'inserted': sum(report['inserted'] for report in reports),
+        'rejected': rejected,
+        'batches': [dict(report, rejected=len(report['rejected'])) for report in reports],
+    })
+
+
+# Top tags by post count (JSON)
+@main.route('/api/tags', methods=['GET'])
+def api_tags():
+    limit = request.args.get('limit', current_app.config['TAG_CLOUD_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+    return jsonify([{'name': tag.name, 'post_count': tag.post_count} for tag in top_tags(limit)])
+
+
+# Ranked full-text search (JSON)
+@main.route('/api/search', methods=['GET'])
+def api_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing q'}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = request.args.get('per_page', current_app.config['SEARCH_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['API_MAX_PAGE_SIZE']))
+    index = get_index(current_app)
+    if index is None:
+        return jsonify({'error': 'Search is not available on this server'}), 503
+    results, total = _search_posts(index, query, page, per_page)
+    return jsonify({
+        'results': [dict(post.to_dict(), rank=rank) for post, rank in results],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+    })
+
 
 @main.route('/post/<int:post_id>')
 def post_detail(post_id):
-    post = Post.query.get_or_404(post_id)
-    return render_template('post_detail.html', post=post)
+    post = db.session.scalar(
+        select(Post).options(*CARD_OPTIONS, undefer(Post.content_html)).where(Post.id == post_id)
+    ) or archive.find_post(post_id)
+    if post is None:
+        abort(404)
+    page = max(1, request.args.get('page', 1, type=int))
+    return render_template(
+        # Building a form issues a CSRF token into the session; anonymous
+        # views stay token-free so the response cache can share them
+        'post_detail.html', post=post,
+        form=CommentForm() if current_user.is_authenticated else None,
+        comments=comments.comment_page(post, page, current_app.config['COMMENTS_PER_PAGE']),
+    )
+
+
+# -------------------
+# Comments & Reactions
+# -------------------
+@main.route('/post/<int:post_id>/comment', methods=['POST'])
+@login_required
+def add_comment(post_id):
+    post = db.get_or_404(Post, post_id)
+    form = CommentForm()
+    if form.validate_on_submit():
+        comments.add_comment(post.id, current_user.id, form.body.data)
+        db.session.commit()
+        flash('Comment added.')
+    else:
+        flash('Comment cannot be empty.')
+    # Jump to the last page, where the new comment is
+    last_page = max(1, -(-post.comment_count // current_app.config['COMMENTS_PER_PAGE']))
+    return redirect(url_for('main.post_detail', post_id=post.id, page=last_page))
+
+
+@main.route('/post/<int:post_id>/<any(like, dislike):kind>', methods=['POST'])
+@login_required
+def react(post_id, kind):
+    post = db.get_or_404(Post, post_id)
+    comments.react(post.id, current_user.id, kind)
+    db.session.commit()
+    return redirect(url_for('main.post_detail', post_id=post.id))
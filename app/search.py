@@ -0,0 +1,112 @@
+# app/search.py
+
+import abc
+
+from sqlalchemy import DDL, event, text
+from app import db
+from app.models import Post
+
+
+class SearchIndex(abc.ABC):
+    """Full-text index over Post.title and Post.content.
+
+    Backends keep themselves in sync with the post table and return post ids
+    ranked best-first.
+    """
+
+    @abc.abstractmethod
+    def search(self, query, page=1, per_page=10):
+        """Return ([(post_id, rank), ...], total_hits) for one page of results."""
+
+    @abc.abstractmethod
+    def rebuild(self):
+        """Recreate the index from the post table."""
+
+
+# -------------------------
+# SQLite FTS5 (default)
+# -------------------------
+# External-content table: post_fts stores only the index, rows are read back
+# from `post` by rowid. Triggers keep it in step with every insert, update and
+# delete, including bulk imports that bypass the ORM.
+FTS5_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        title, content, content='post', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+for statement in FTS5_DDL:
+    event.listen(Post.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS post_fts').execute_if(dialect='sqlite'))
+
+
+def fts5_query(query):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted, so FTS5 operators typed by users are matched as text.
+    All words must match and the last one also matches as a prefix.
+    """
+    terms = ['"' + word.replace('"', '""') + '"' for word in query.split()]
+    if not terms:
+        return None
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class FTS5Index(SearchIndex):
+    # bm25() weights: a hit in the title counts ten times one in the body
+    TITLE_WEIGHT = 10.0
+    CONTENT_WEIGHT = 1.0
+
+    def search(self, query, page=1, per_page=10):
+        match = fts5_query(query)
+        if match is None:
+            return [], 0
+        total = db.session.execute(
+            text('SELECT count(*) FROM post_fts WHERE post_fts MATCH :q'), {'q': match}
+        ).scalar()
+        hits = db.session.execute(
+            text('SELECT rowid, bm25(post_fts, :tw, :cw) AS rank FROM post_fts '
+                 'WHERE post_fts MATCH :q ORDER BY rank LIMIT :limit OFFSET :offset'),
+            {'q': match, 'tw': self.TITLE_WEIGHT, 'cw': self.CONTENT_WEIGHT,
+             'limit': per_page, 'offset': (page - 1) * per_page},
+        ).all()
+        return [(post_id, rank) for post_id, rank in hits], total
+
+    def rebuild(self):
+        for statement in FTS5_DDL:
+            db.session.execute(text(statement))
+        db.session.execute(text("INSERT INTO post_fts(post_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+
+SEARCH_BACKENDS = {
+    'fts5': FTS5Index,
+}
+
+# Default backend per database dialect. Databases without one (Postgres,
+# until it gets a backend) run with search switched off.
+DIALECT_BACKENDS = {
+    'sqlite': 'fts5',
+}
+
+
+def get_index(app):
+    """The configured search backend, or None if search is unavailable.
+
+    SEARCH_BACKEND picks one by name; left unset, the database's dialect does.
+    """
+    name = app.config['SEARCH_BACKEND'] or DIALECT_BACKENDS.get(db.engine.dialect.name)
+    return SEARCH_BACKENDS[name]() if name else None
@@ -0,0 +1,165 @@
+# app/security.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from app.cache import LRUCache
+
+# Password hashing is deliberately slow. Each login costs one scrypt/pbkdf2
+# run, so a burst of logins can occupy every worker and stall page views.
+# This module bounds that cost:
+#
+# * hash parameters come from Config. Hashes made with older parameters are
+#   upgraded the next time their owner logs in (needs_rehash);
+# * hashing runs on a small thread pool. A queue-depth limit turns floods
+#   into a fast HashingBusy instead of a pile-up;
+# * token buckets per username and per client IP, charged for failed
+#   logins only, reject repeated guessing before any hashing happens. The
+#   client IP is only right behind a proxy if TRUSTED_PROXIES is set.
+
+
+class HashingBusy(Exception):
+    """Too many password hashes already queued; try again shortly."""
+
+
+class _HashPool:
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._wait = None
+
+    def configure(self, workers, queue_limit, wait):
+        """Hash on `workers` threads; workers=0 hashes inline in the caller."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if workers:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash')
+            # running + queued; anything past this is turned away immediately
+            self._slots = threading.BoundedSemaphore(workers + queue_limit)
+            self._wait = wait
+
+    def run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # the slot is held until the hash finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self._wait)
+        except FutureTimeout:
+            raise HashingBusy() from None
+
+
+pool = _HashPool()
+
+
+# -------------------------
+# Hashing
+# -------------------------
+def _method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+
+def hash_password(password):
+    method, salt_length = _method(), current_app.config['PASSWORD_SALT_LENGTH']
+    return pool.run(generate_password_hash, password, method, salt_length)
+
+
+def verify_password(pwhash, password):
+    if not pwhash:
+        return False
+    return pool.run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if `pwhash` was made with other parameters than the configured ones."""
+    method, _, rest = (pwhash or '').partition('$')
+    salt = rest.partition('$')[0]
+    return method != _method() or len(salt) != current_app.config['PASSWORD_SALT_LENGTH']
+
+
+# -------------------------
+# Login rate limiting
+# -------------------------
+class TokenBucket:
+    """Per-key token buckets: `capacity` attempts, refilled at `rate` per second.
+
+    Buckets live in an LRU so a spray of distinct keys can't grow memory
+    without bound; an evicted bucket simply starts full again.
+    """
+
+    def __init__(self, capacity, rate, maxsize=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _refilled(self, key, now):
+        tokens, stamp = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - stamp) * self.rate)
+
+    def tokens(self, key):
+        """Attempts left for `key`, without spending one."""
+        with self._lock:
+            return self._refilled(key, time.monotonic())
+
+    def charge(self, key):
+        """Spend one attempt for `key` (never below zero)."""
+        now = time.monotonic()
+        with self._lock:
+            self._buckets.set(key, (max(0, self._refilled(key, now) - 1), now))
+
+    def reset(self):
+        self._buckets.clear()
+
+    def retry_after(self):
+        return max(1, int(1 / self.rate)) if self.rate else 60
+
+
+login_limiter = TokenBucket(capacity=5, rate=5 / 60)
+
+
+def _login_keys(username, remote_addr):
+    return f'user:{(username or "").lower()}', f'ip:{remote_addr}'
+
+
+def allow_login_attempt(username, remote_addr):
+    """May this client try a password for `username` now? Spends nothing.
+
+    Only failed attempts are charged (see login_failed). A client is turned
+    away once its own address has run out, or when the username has run out
+    and this address has failed recently too. A flood against one account
+    from elsewhere therefore can't lock its owner out.
+    """
+    by_user, by_addr = _login_keys(username, remote_addr)
+    addr_tokens = login_limiter.tokens(by_addr)
+    if addr_tokens < 1:
+        return False
+    return login_limiter.tokens(by_user) >= 1 or addr_tokens >= login_limiter.capacity
+
+
+def login_failed(username, remote_addr):
+    for key in _login_keys(username, remote_addr):
+        login_limiter.charge(key)
+
+
+def init_app(app):
+    pool.configure(app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_QUEUE_LIMIT'],
+                   app.config['PASSWORD_HASH_TIMEOUT'])
+    login_limiter.capacity = app.config['LOGIN_RATE_LIMIT']
+    login_limiter.rate = app.config['LOGIN_RATE_LIMIT'] / app.config['LOGIN_RATE_PERIOD']
+    login_limiter.reset()
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(exc):
+        return 'Too many logins in progress, please retry in a moment.', 503, {'Retry-After': '2'}
@@ -0,0 +1,137 @@
+# app/serializers.py
+
+import json
+
+from sqlalchemy import func, select
+from app import db
+from app.cache import LRUCache
+from app.models import Post, Tag, User, post_tags
+
+try:
+    import orjson  # optional, several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+
+# API payloads for posts, built from plain row tuples rather than ORM objects
+# and encoded once per post version: a listing only looks up (id, version)
+# for its page, reuses the bytes it already has, and fetches the rest in one
+# query. Post.version is bumped on every write (see app/models.py), so a
+# cached payload never outlives the post it was made from. Author renames
+# are picked up when the entry expires (API_CACHE_TTL).
+
+FIELDS = ('id', 'title', 'content', 'author', 'tags', 'likes', 'dislikes',
+          'comment_count', 'timestamp')
+
+# Tag names are joined with a character that can't be typed into a tag
+TAG_SEPARATOR = '\x1f'
+
+# (post id, version, fields) -> encoded JSON object
+payload_cache = LRUCache(maxsize=10000, ttl=300)
+
+
+def dumps(obj):
+    """Encode `obj` as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def parse_fields(value):
+    """Fields requested by ?fields=a,b (all by default), in FIELDS order.
+
+    Raises ValueError naming any unknown field.
+    """
+    if not value:
+        return FIELDS
+    wanted = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = wanted.difference(FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    return tuple(name for name in FIELDS if name in wanted) or FIELDS
+
+
+# -------------------------
+# Row query
+# -------------------------
+def _tag_names():
+    # One correlated aggregate per post keeps this a single query without
+    # GROUP BY over the post and user columns
+    if db.session.get_bind(mapper=Post.__mapper__).dialect.name == 'postgresql':
+        names = func.string_agg(Tag.name, TAG_SEPARATOR)
+    else:
+        names = func.group_concat(Tag.name, TAG_SEPARATOR)
+    return (
+        select(names).select_from(post_tags).join(Tag, Tag.id == post_tags.c.tag_id)
+        .where(post_tags.c.post_id == Post.id)
+        .scalar_subquery()
+    )
+
+
+def _rows_query(fields):
+    columns = {
+        'title': Post.title,
+        'content': Post.content,
+        'likes': Post.likes,
+        'dislikes': Post.dislikes,
+        'comment_count': Post.comment_count,
+        'timestamp': Post.timestamp,
+    }
+    if 'author' in fields:
+        columns['author'] = User.username
+    if 'tags' in fields:
+        columns['tags'] = _tag_names()
+    stmt = select(Post.id, Post.version, *(
+        columns[name].label(name) for name in fields if name in columns))
+    if 'author' in fields:
+        stmt = stmt.outerjoin(User, User.id == Post.user_id)
+    return stmt
+
+
+def _to_payload(row, fields):
+    data = {}
+    for name in fields:
+        value = getattr(row, name)
+        if name == 'tags':
+            value = sorted(value.split(TAG_SEPARATOR)) if value else []
+        elif name == 'timestamp':
+            value = value.isoformat() if value else None
+        data[name] = value
+    return data
+
+
+# -------------------------
+# Encoding
+# -------------------------
+def encode_posts(refs, fields=FIELDS):
+    """Encoded JSON objects for the posts in `refs`, in the same order.
+
+    `refs` are rows with `id` and `version` (e.g. from a keyset listing
+    query); posts deleted in the meantime are left out.
+    """
+    encoded = {}
+    missing = []
+    for ref in refs:
+        blob = payload_cache.get((ref.id, ref.version, fields))
+        if blob is None:
+            missing.append(ref.id)
+        else:
+            encoded[ref.id] = blob
+    if missing:
+        for row in db.session.execute(_rows_query(fields).where(Post.id.in_(missing))):
+            blob = dumps(_to_payload(row, fields))
+            payload_cache.set((row.id, row.version, fields), blob)
+            encoded[row.id] = blob
+    return [encoded[ref.id] for ref in refs if ref.id in encoded]
+
+
+def envelope(key, blobs, **extra):
+    """`{"<key>": [blobs...], **extra}` without decoding the cached blobs."""
+    head = b'{' + dumps(key) + b':[' + b','.join(blobs) + b']'
+    tail = b''.join(b',' + dumps(name) + b':' + dumps(value) for name, value in extra.items())
+    return head + tail + b'}'
+
+
+def init_app(app):
+    payload_cache.maxsize = app.config['API_CACHE_SIZE']
+    payload_cache.ttl = app.config['API_CACHE_TTL']
+    payload_cache.clear()
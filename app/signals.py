@@ -0,0 +1,53 @@
+# app/signals.py
+
+from blinker import Namespace
+from sqlalchemy import event
+from app import db
+
+_signals = Namespace()
+
+# Sent once after a commit that created, edited or deleted posts.
+# Caches subscribe to this to drop anything derived from post content.
+posts_changed = _signals.signal('posts-changed')
+
+# Sent after a commit that only moved like/dislike counts. Not worth
+# throwing caches away for, but Last-Modified should move on.
+post_counts_changed = _signals.signal('post-counts-changed')
+
+
+def mark_posts_changed(session=None):
+    """Flag the current transaction as touching posts.
+
+    ORM changes are detected automatically; call this after Core-level writes
+    (bulk inserts, archive moves) that the session can't see.
+    """
+    (session or db.session).info['posts_changed'] = True
+
+
+def mark_post_counts_changed(session=None):
+    (session or db.session).info['post_counts_changed'] = True
+
+
+@event.listens_for(db.session, 'before_flush')
+def _detect_post_changes(session, flush_context, instances):
+    from app.models import Post
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Post):
+            session.info['posts_changed'] = True
+            return
+
+
+@event.listens_for(db.session, 'after_commit')
+def _send_posts_changed(session):
+    if session.info.pop('posts_changed', False):
+        posts_changed.send(session)
+    elif session.info.pop('post_counts_changed', False):
+        post_counts_changed.send(session)
+    session.info.pop('post_counts_changed', None)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_post_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('posts_changed', None)
+        session.info.pop('post_counts_changed', None)
@@ -0,0 +1,41 @@
+# app/startup.py
+
+import os
+
+import click
+from jinja2 import FileSystemBytecodeCache
+
+# Startup work done once, up front, instead of on the first requests.
+# gunicorn.conf.py preloads the app in the master process and calls
+# warm_up() before forking, so every worker starts with compiled templates
+# and a ready Markdown converter (copy-on-write) instead of building them
+# on its first hits.
+
+
+def running_cli():
+    """True while the `flask` command is creating the app (not gunicorn or tests)."""
+    return click.get_current_context(silent=True) is not None
+
+
+def init_app(app):
+    cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if cache_dir:
+        # Compiled template code on disk, reused across restarts and deploys
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def compile_templates(app):
+    """Load every template under app/templates; returns how many."""
+    names = app.jinja_env.list_templates(extensions=('html', 'xml', 'txt'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """Do the lazy first-request work now. Touches no database."""
+    from app import rendering
+    count = compile_templates(app)
+    rendering.render_markdown('*warm*\n\n```\nup\n```')
+    return count
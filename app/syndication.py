@@ -0,0 +1,178 @@
+# app/syndication.py
+
+import hashlib
+import threading
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from flask import Response, current_app, request, url_for
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload, undefer
+from app import db
+from app.cache import LRUCache
+from app.models import Post, Tag, post_tags
+from app.rendering import render_markdown
+from app.signals import posts_changed
+
+# Atom feeds for / and /tag/<name>, for aggregators that would otherwise
+# scrape the HTML pages. A feed is the newest ATOM_FEED_SIZE posts with
+# their stored Markdown HTML. It is kept as encoded bytes until a post
+# changes. Each <entry> is cached per post version, so regenerating after
+# an edit only re-renders the posts that changed. ETag and Last-Modified
+# turn most polls into a 304 with no database access at all.
+#
+# posts_changed only reaches this process, so built feeds also expire after
+# ATOM_MAX_AGE and are keyed by the response cache's generation. With the
+# shared (redis) response cache that generation also moves on writes made
+# by other workers and by `flask worker`.
+
+# (tag name or None, url root, response cache generation) -> (body, etag, last_modified)
+feed_cache = LRUCache(maxsize=256)
+# (post id, version, url root) -> encoded <entry>
+entry_cache = LRUCache(maxsize=2048)
+
+# Last-Modified must survive regeneration when the bytes come out the
+# same, so validators are remembered apart from the bodies
+_validators = LRUCache(maxsize=256)
+
+# Bumped on every post change; a feed built across a bump isn't stored
+_generation = 0
+_lock = threading.Lock()
+
+
+def init_app(app):
+    feed_cache.maxsize = _validators.maxsize = app.config['ATOM_CACHE_SIZE']
+    feed_cache.ttl = app.config['ATOM_MAX_AGE'] or None
+    feed_cache.clear()
+    entry_cache.clear()
+    _validators.clear()
+
+
+@posts_changed.connect
+def _invalidate(sender):
+    global _generation
+    with _lock:
+        _generation += 1
+        feed_cache.clear()
+
+
+def _shared_generation():
+    backend = current_app.extensions.get('response_cache')
+    return backend.generation() if backend is not None else None
+
+
+def _iso(timestamp):
+    # Post timestamps are naive UTC
+    return timestamp.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+# -------------------------
+# Building
+# -------------------------
+def _entry(post):
+    url = url_for('main.post_detail', post_id=post.id, _external=True)
+    html = post.content_html if post.content_hash else render_markdown(post.content)
+    author = post.author.username if post.author else 'unknown'
+    parts = [
+        '<entry>',
+        f'<id>{escape(url)}</id>',
+        f'<title>{escape(post.title)}</title>',
+        f'<link rel="alternate" href={quoteattr(url)}/>',
+        f'<published>{_iso(post.timestamp)}</published>',
+        f'<updated>{_iso(post.timestamp)}</updated>',
+        f'<author><name>{escape(author)}</name></author>',
+        *(f'<category term={quoteattr(tag.name)}/>' for tag in post.tags),
+        f'<content type="html">{escape(html or "")}</content>',
+        '</entry>',
+    ]
+    return ''.join(parts).encode('utf-8')
+
+
+def _entries(refs):
+    """Encoded entries for (id, version) refs, loading only the cache misses."""
+    root = request.url_root
+    encoded = {}
+    missing = []
+    for ref in refs:
+        entry = entry_cache.get((ref.id, ref.version, root))
+        if entry is None:
+            missing.append(ref.id)
+        else:
+            encoded[ref.id] = entry
+    if missing:
+        posts = db.session.scalars(
+            select(Post).options(joinedload(Post.author), selectinload(Post.tags),
+                                 undefer(Post.content_html))
+            .where(Post.id.in_(missing))
+        )
+        for post in posts:
+            encoded[post.id] = entry = _entry(post)
+            entry_cache.set((post.id, post.version, root), entry)
+    return [encoded[ref.id] for ref in refs if ref.id in encoded]
+
+
+def _build(tag):
+    stmt = (
+        select(Post.id, Post.version, Post.timestamp)
+        .order_by(Post.timestamp.desc(), Post.id.desc())
+        .limit(current_app.config['ATOM_FEED_SIZE'])
+    )
+    if tag is None:
+        title, self_url = 'Microblog', url_for('main.atom_feed', _external=True)
+        page_url = url_for('main.index', _external=True)
+    else:
+        stmt = stmt.join(post_tags, post_tags.c.post_id == Post.id).where(post_tags.c.tag_id == tag.id)
+        title = f'Microblog: #{tag.name}'
+        self_url = url_for('main.tag_atom_feed', tag_name=tag.name, _external=True)
+        page_url = url_for('main.tag_filter', tag_name=tag.name, _external=True)
+    refs = db.session.execute(stmt).all()
+    updated = _iso(refs[0].timestamp) if refs else _iso(datetime(1970, 1, 1))
+    head = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<id>{escape(self_url)}</id>'
+        f'<title>{escape(title)}</title>'
+        f'<updated>{updated}</updated>'
+        f'<link rel="self" href={quoteattr(self_url)}/>'
+        f'<link rel="alternate" type="text/html" href={quoteattr(page_url)}/>'
+    ).encode('utf-8')
+    return head + b''.join(_entries(refs)) + b'</feed>'
+
+
+# -------------------------
+# Serving
+# -------------------------
+def feed_response(tag_name=None):
+    """The Atom feed for all posts or for one tag, as a conditional response.
+
+    Returns None if the tag doesn't exist.
+    """
+    key = (tag_name, request.url_root)
+    cached = feed_cache.get(key + (_shared_generation(),))
+    if cached is None:
+        tag = None
+        if tag_name is not None:
+            tag = db.session.scalar(select(Tag).where(Tag.name == tag_name))
+            if tag is None:
+                return None
+        generation, shared = _generation, _shared_generation()
+        body = _build(tag)
+        etag = hashlib.sha1(body).hexdigest()
+        previous = _validators.get(key)
+        if previous and previous[0] == etag:
+            last_modified = previous[1]
+        else:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            _validators.set(key, (etag, last_modified))
+        cached = (body, etag, last_modified)
+        with _lock:
+            if generation == _generation:
+                feed_cache.set(key + (shared,), cached)
+
+    body, etag, last_modified = cached
+    response = Response(body, mimetype='application/atom+xml')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['ATOM_MAX_AGE']
+    return response.make_conditional(request)
@@ -0,0 +1,128 @@
+# app/tags.py
+
+from collections import Counter
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Tag, post_tags, post_tags_archive
+
+MAX_TAG_LENGTH = 64
+
+
+def normalize_tag_names(names):
+    """Clean up user-supplied tags: a comma-separated string or a list of names.
+
+    Names are trimmed, inner whitespace collapsed, lower-cased and de-duplicated
+    (first occurrence wins); blanks are dropped.
+    """
+    if not names:
+        return []
+    if isinstance(names, str):
+        names = names.split(',')
+    result = []
+    for name in names:
+        name = ' '.join(str(name).split()).lower()[:MAX_TAG_LENGTH]
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def _insert_missing(names):
+    """Insert tags that don't exist yet, ignoring ones a concurrent writer just added."""
+    rows = [{'name': name} for name in names]
+    dialect = db.session.get_bind(mapper=Tag.__mapper__).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        # No portable upsert: insert one by one, each in its own savepoint
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(Tag.__table__.insert(), row)
+            except IntegrityError:
+                pass
+        return
+    db.session.execute(insert(Tag).on_conflict_do_nothing(index_elements=['name']), rows)
+
+
+def resolve_tag_map(names):
+    """Return {name: Tag} for the normalized names, creating missing tags.
+
+    Costs one IN query when every tag exists, otherwise one bulk upsert and a
+    second IN query for the new rows.
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return {}
+    found = {tag.name: tag for tag in db.session.scalars(select(Tag).where(Tag.name.in_(names)))}
+    missing = [name for name in names if name not in found]
+    if missing:
+        _insert_missing(missing)
+        found.update(
+            (tag.name, tag) for tag in db.session.scalars(select(Tag).where(Tag.name.in_(missing)))
+        )
+    return found
+
+
+def resolve_tags(names):
+    """Return Tag objects for `names` in the order given, creating missing ones."""
+    found = resolve_tag_map(names)
+    return [found[name] for name in normalize_tag_names(names)]
+
+
+def adjust_tag_counts(added=(), removed=()):
+    """Move Tag.post_count by +1 per tag id in `added` and -1 per id in `removed`.
+
+    Call in the transaction that adds or removes the post_tags links. Only
+    the touched Tag rows are written, so a write costs the same however
+    popular the tag is.
+    """
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        db.session.execute(
+            update(Tag).where(Tag.id.in_(tag_ids)).values(post_count=Tag.post_count + delta),
+            execution_options={'synchronize_session': False},
+        )
+
+
+def refresh_tag_counts(tag_ids):
+    """Recount Tag.post_count for the given tags inside the current transaction.
+
+    Scans every link of each tag; writes use adjust_tag_counts() instead.
+    This is the repair path behind `flask recount`.
+    """
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return
+    # Archived posts keep their tags, so both link tables count
+    count = (
+        select(func.count())
+        .select_from(post_tags)
+        .where(post_tags.c.tag_id == Tag.id)
+        .scalar_subquery()
+    ) + (
+        select(func.count())
+        .select_from(post_tags_archive)
+        .where(post_tags_archive.c.tag_id == Tag.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Tag).where(Tag.id.in_(tag_ids)).values(post_count=count),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def top_tags(limit):
+    """Most used tags, biggest first, straight off the post_count index."""
+    return db.session.scalars(
+        select(Tag).where(Tag.post_count > 0)
+        .order_by(Tag.post_count.desc(), Tag.name).limit(limit)
+    ).all()
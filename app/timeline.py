@@ -0,0 +1,233 @@
+# app/timeline.py
+
+import bisect
+import threading
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.orm import joinedload, selectinload
+from app import db
+from app.cache import LRUCache
+from app.models import Post, User, followers
+from app.pagination import decode_cursor, encode_cursor
+
+# Per-user timelines, hybrid fan-out:
+#
+# * light authors (fewer than TIMELINE_HEAVY_FOLLOWERS followers) push new
+#   post ids into each follower's cached timeline on write;
+# * heavy authors are pulled at read time with one query on the
+#   (user_id, timestamp, id) index and merged in.
+#
+# Cached timelines hold (timestamp, id) pairs, oldest first, for the
+# reader's light authors and their own posts. They are per process, so
+# pushes only reach the writing process (and none at all from `flask
+# worker`). Each timeline therefore also keeps a watermark, the highest post
+# id it has seen, and every read first catches up on the light authors'
+# posts above it; ids only ever grow, see Post. Timelines expire after
+# TIMELINE_CACHE_TTL, which bounds how long an author crossing the heavy
+# threshold can be missing from one. Reading past the cached window pulls
+# everything from the post table.
+
+timelines = LRUCache(maxsize=1024)
+_push_lock = threading.Lock()
+
+
+def init_app(app):
+    timelines.maxsize = app.config['TIMELINE_CACHE_SIZE']
+    timelines.ttl = app.config['TIMELINE_CACHE_TTL']
+    timelines.clear()
+
+
+# -------------------------
+# Follow graph
+# -------------------------
+def is_following(follower_id, followed_id):
+    return db.session.scalar(
+        select(func.count()).select_from(followers).where(
+            followers.c.follower_id == follower_id, followers.c.followed_id == followed_id)
+    ) > 0
+
+
+def followed_ids(user_id):
+    return set(db.session.scalars(
+        select(followers.c.followed_id).where(followers.c.follower_id == user_id)
+    ))
+
+
+def refresh_follower_count(user_id):
+    """Recount User.follower_count off the (followed_id, follower_id) index."""
+    count = (
+        select(func.count()).select_from(followers)
+        .where(followers.c.followed_id == User.id).scalar_subquery()
+    )
+    db.session.execute(
+        update(User).where(User.id == user_id).values(follower_count=count),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def follow(follower_id, followed_id):
+    """Add a follow edge (no-op if it exists). Caller commits."""
+    if follower_id == followed_id or is_following(follower_id, followed_id):
+        return False
+    db.session.execute(insert(followers).values(follower_id=follower_id, followed_id=followed_id))
+    refresh_follower_count(followed_id)
+    timelines.delete(follower_id)
+    return True
+
+
+def unfollow(follower_id, followed_id):
+    result = db.session.execute(delete(followers).where(
+        followers.c.follower_id == follower_id, followers.c.followed_id == followed_id))
+    if not result.rowcount:
+        return False
+    refresh_follower_count(followed_id)
+    timelines.delete(follower_id)
+    return True
+
+
+# -------------------------
+# Fan-out on write
+# -------------------------
+def _is_heavy(follower_count):
+    return follower_count >= current_app.config['TIMELINE_HEAVY_FOLLOWERS']
+
+
+def push_posts(posts):
+    """Push committed posts into their light authors' followers' cached timelines.
+
+    `posts` is an iterable of (post id, author id, timestamp). Timelines that
+    aren't cached are skipped; they are built from the database on next read.
+    """
+    by_author = {}
+    for post_id, user_id, timestamp in posts:
+        if user_id is not None:
+            by_author.setdefault(user_id, []).append((timestamp, post_id))
+    if not by_author or not len(timelines):
+        return
+
+    counts = dict(db.session.execute(
+        select(User.id, User.follower_count).where(User.id.in_(by_author))
+    ).all())
+    light = [user_id for user_id in by_author if not _is_heavy(counts.get(user_id, 0))]
+    if not light:
+        return
+    readers = db.session.execute(
+        select(followers.c.followed_id, followers.c.follower_id)
+        .where(followers.c.followed_id.in_(light))
+    ).all()
+    readers += [(user_id, user_id) for user_id in light]  # own posts
+
+    with _push_lock:
+        for author_id, reader_id in readers:
+            cached = timelines.get(reader_id)
+            if cached is not None:
+                _merge(cached, by_author[author_id])
+
+
+def _merge(cached, new_entries):
+    """Insert (timestamp, id) pairs into a cached timeline, trimmed to TIMELINE_SIZE."""
+    entries = cached['entries']
+    for entry in new_entries:
+        at = bisect.bisect_left(entries, entry)
+        if at == len(entries) or entries[at] != entry:  # edits are pushed again
+            entries.insert(at, entry)
+    size = current_app.config['TIMELINE_SIZE']
+    if len(entries) > size:
+        del entries[:-size]
+        cached['full'] = True
+
+
+def forget_author(user_id):
+    """Drop the cached timelines that may show `user_id`'s posts (after deletes)."""
+    timelines.delete(user_id)
+    for follower_id in db.session.scalars(
+        select(followers.c.follower_id).where(followers.c.followed_id == user_id)
+    ):
+        timelines.delete(follower_id)
+
+
+# -------------------------
+# Reads
+# -------------------------
+def _newest(user_ids, before, limit):
+    """(timestamp, id) pairs of the authors' newest posts, one indexed query."""
+    stmt = (
+        select(Post.timestamp, Post.id).where(Post.user_id.in_(user_ids))
+        .order_by(Post.timestamp.desc(), Post.id.desc()).limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(Post.timestamp, Post.id) < tuple_(*before))
+    return [tuple(row) for row in db.session.execute(stmt)]
+
+
+def _authors(user_id):
+    """Split the people `user_id` reads into (light + self, heavy) id lists."""
+    rows = db.session.execute(
+        select(User.id, User.follower_count)
+        .join(followers, followers.c.followed_id == User.id)
+        .where(followers.c.follower_id == user_id)
+    ).all()
+    light = [user_id] + [author for author, count in rows if not _is_heavy(count)]
+    heavy = [author for author, count in rows if _is_heavy(count)]
+    return light, heavy
+
+
+def _posted_since(user_ids, watermark, limit):
+    """(timestamp, id) pairs of the authors' posts with ids above `watermark`."""
+    return [tuple(row) for row in db.session.execute(
+        select(Post.timestamp, Post.id).where(Post.user_id.in_(user_ids), Post.id > watermark)
+        .order_by(Post.timestamp.desc(), Post.id.desc()).limit(limit)
+    )]
+
+
+def _cached_timeline(user_id, light):
+    size = current_app.config['TIMELINE_SIZE']
+    cached = timelines.get(user_id)
+    if cached is None:
+        entries = _newest(light, None, size)
+        cached = {'entries': entries[::-1], 'full': len(entries) >= size,
+                  'watermark': max((id for _, id in entries), default=0)}
+        timelines.set(user_id, cached)
+        return cached
+    # Catch up on posts this process wasn't told about
+    new_entries = _posted_since(light, cached['watermark'], size)
+    if new_entries:
+        with _push_lock:
+            _merge(cached, new_entries)
+            cached['watermark'] = max(cached['watermark'], *(id for _, id in new_entries))
+    return cached
+
+
+def timeline_page(user_id, cursor, per_page):
+    """Posts by `user_id` and the authors they follow, newest first.
+
+    Returns (posts, next cursor). Raises ValueError for a malformed cursor.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    want = per_page + 1
+    light, heavy = _authors(user_id)
+    cached = _cached_timeline(user_id, light)
+
+    entries = cached['entries']
+    if before is not None:
+        entries = entries[:bisect.bisect_left(entries, tuple(before))]
+    if cached['full'] and len(entries) < want:
+        # Past the cached window: pull everyone straight from the index
+        merged = _newest(light + heavy, before, want)
+    else:
+        merged = entries[::-1][:want]
+        if heavy:
+            merged = sorted(set(merged) | set(_newest(heavy, before, want)), reverse=True)[:want]
+
+    next_cursor = None
+    if len(merged) > per_page:
+        merged = merged[:per_page]
+        next_cursor = encode_cursor(*merged[-1])
+
+    ids = [post_id for _, post_id in merged]
+    if not ids:
+        return [], next_cursor
+    found = {post.id: post for post in db.session.scalars(
+        select(Post).options(joinedload(Post.author), selectinload(Post.tags)).where(Post.id.in_(ids)))}
+    return [found[post_id] for post_id in ids if post_id in found], next_cursor
@@ -0,0 +1,118 @@
+# benchmarks/bench_api_serialization.py
+#
+# Times GET /api/posts on a large table: 100-post JSON pages and a full
+# NDJSON export, against the old ORM + Post.to_dict() + stdlib json path,
+# with a cold and a warm payload cache. Run from the repo root:
+#
+#     python benchmarks/bench_api_serialization.py --posts 10000 --pages 50
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, tuple_  # noqa: E402
+from sqlalchemy.orm import joinedload, selectinload  # noqa: E402
+from app import create_app, db, serializers  # noqa: E402
+from app.models import User, Post, Tag, post_tags  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+
+
+def seed(posts):
+    user = User(username='bench', email='bench@example.com')
+    tags = [Tag(name=f'tag{i}') for i in range(20)]
+    db.session.add_all([user, *tags])
+    db.session.flush()
+    start = datetime(2025, 1, 1)
+    db.session.execute(insert(Post), [
+        {'title': f'Post {i}', 'content': f'Body of post **{i}** ' * 20, 'user_id': user.id,
+         'timestamp': start + timedelta(seconds=i)} for i in range(posts)])
+    ids = db.session.scalars(select(Post.id)).all()
+    db.session.execute(insert(post_tags), [
+        {'post_id': id, 'tag_id': tags[(id + k) % len(tags)].id} for id in ids for k in range(3)])
+    db.session.commit()
+
+
+def legacy_page(limit):
+    # What GET /api/posts did before app/serializers.py
+    posts = db.session.scalars(
+        select(Post).options(joinedload(Post.author), selectinload(Post.tags))
+        .order_by(Post.timestamp.desc(), Post.id.desc()).limit(limit)
+    ).all()
+    body = json.dumps({'posts': [post.to_dict() for post in posts], 'next_cursor': None})
+    db.session.remove()
+    return body
+
+
+def legacy_export(chunk=500):
+    # yield_per can't be combined with selectinload(Post.tags), so read
+    # keyset chunks of `chunk` posts instead
+    size, last = 0, None
+    while True:
+        query = (select(Post).options(joinedload(Post.author), selectinload(Post.tags))
+                 .order_by(Post.timestamp.desc(), Post.id.desc()).limit(chunk))
+        if last is not None:
+            query = query.where(tuple_(Post.timestamp, Post.id) < last)
+        posts = db.session.scalars(query).all()
+        if not posts:
+            break
+        size += sum(len(json.dumps(post.to_dict())) + 1 for post in posts)
+        last = (posts[-1].timestamp, posts[-1].id)
+        db.session.expunge_all()
+    db.session.remove()
+    return size
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        seed(args.posts)
+        client = app.test_client()
+
+        def page():
+            assert client.get('/api/posts?limit=100').status_code == 200
+
+        def export():
+            return len(client.get('/api/posts?format=ndjson').get_data())
+
+        def cold(fn):
+            def run():
+                serializers.payload_cache.clear()
+                fn()
+            return run
+
+        print(f'{args.posts} posts, JSON encoder: {"orjson" if serializers.orjson else "json"}')
+        print(f'100-post page, ORM + to_dict:   {timed(lambda: legacy_page(100), args.pages):8.2f} ms')
+        print(f'100-post page, rows, cold cache: {timed(cold(page), args.pages):8.2f} ms')
+        page()
+        print(f'100-post page, rows, warm cache: {timed(page, args.pages):8.2f} ms')
+        print(f'NDJSON export, ORM + to_dict:   {timed(legacy_export, 3):8.2f} ms')
+        print(f'NDJSON export, rows, cold cache: {timed(cold(export), 3):8.2f} ms')
+        export()
+        print(f'NDJSON export, rows, warm cache: {timed(export, 3):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
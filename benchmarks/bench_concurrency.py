@@ -0,0 +1,105 @@
+# benchmarks/bench_concurrency.py
+#
+# Concurrent read/write load against a file-backed SQLite database, once with
+# the default Config and once with ProductionConfig (WAL, busy timeout, ...).
+# Each worker is a separate process with its own app, like gunicorn -w N.
+#
+#     python benchmarks/bench_concurrency.py --readers 4 --writers 2 --seconds 5
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+
+def make_config(profile, path):
+    base = getattr(config, profile)
+    return type('BenchConfig', (base,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path,
+        'RESPONSE_CACHE_ENABLED': False,
+    })
+
+
+def seed(profile, path, posts):
+    from app import create_app, db
+    from app.models import User, Post
+
+    app = create_app(make_config(profile, path))
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        db.session.add(user)
+        for i in range(posts):
+            post = Post(title=f'Seed {i}', content=f'Seed post **{i}**', author=user)
+            post.render()
+            db.session.add(post)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(profile, path, role, seconds, results):
+    from app import create_app
+
+    client = create_app(make_config(profile, path)).test_client()
+    ok = errors = 0
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        try:
+            if role == 'read':
+                response = client.get('/api/posts?limit=20')
+            else:
+                response = client.post('/api/posts', json={
+                    'title': f'Load {os.getpid()}-{n}', 'content': 'written under load', 'tags': ['load'],
+                })
+            if response.status_code < 400:
+                ok += 1
+            else:
+                errors += 1
+        except Exception:  # "database is locked" surfaces as an OperationalError
+            errors += 1
+    results.put((role, ok, errors))
+
+
+def run(profile, readers, writers, seconds, posts):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(profile, path, posts)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=worker, args=(profile, path, role, seconds, results))
+                 for role in ['read'] * readers + ['write'] * writers]
+        for proc in procs:
+            proc.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in procs:
+            role, ok, errors = results.get()
+            totals[role][0] += ok
+            totals[role][1] += errors
+        for proc in procs:
+            proc.join()
+
+    print(f'{profile:17} reads {totals["read"][0] / seconds:8.1f}/s ({totals["read"][1]} errors)   '
+          f'writes {totals["write"][0] / seconds:7.1f}/s ({totals["write"][1]} errors)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent read/write throughput by config profile')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--posts', type=int, default=500)
+    args = parser.parse_args()
+
+    for profile in ('Config', 'ProductionConfig'):
+        run(profile, args.readers, args.writers, args.seconds, args.posts)
+
+
+if __name__ == '__main__':
+    main()
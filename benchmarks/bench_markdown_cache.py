@@ -0,0 +1,73 @@
+# benchmarks/bench_markdown_cache.py
+#
+# Times rendering of the home feed with and without the rendered-Markdown
+# cache. Run from the repo root:
+#
+#     python benchmarks/bench_markdown_cache.py --posts 200 --requests 300
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from config import Config  # noqa: E402
+
+SAMPLE = '''# Heading {i}
+
+Some **bold** text, some *italics* and a [link](https://example.com/{i}).
+
+- item one
+- item two
+- item three
+
+```python
+def hello_{i}():
+    return "world"
+```
+'''
+
+
+def run(cache_enabled, posts, requests):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        MARKDOWN_CACHE_ENABLED = cache_enabled
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        for i in range(posts):
+            post = Post(title=f'Post {i}', content=SAMPLE.format(i=i) * 3, author=user)
+            post.render()
+            db.session.add(post)
+        db.session.commit()
+
+    client = app.test_client()
+    pages = max(1, posts // 5)
+    client.get('/')  # warm up
+    start = time.perf_counter()
+    for n in range(requests):
+        response = client.get(f'/?page={n % pages + 1}')
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    without = run(False, args.posts, args.requests)
+    with_cache = run(True, args.posts, args.requests)
+    print(f'index render, markdown per request: {without:7.2f} ms/request')
+    print(f'index render, cached HTML:          {with_cache:7.2f} ms/request')
+    print(f'speedup: {without / with_cache:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
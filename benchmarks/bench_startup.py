@@ -0,0 +1,96 @@
+# benchmarks/bench_startup.py
+#
+# Measures what a fresh worker pays before it is fast: importing the app
+# (create_app) and its first requests. Each scenario runs in a new Python
+# process against a seeded throwaway SQLite database:
+#
+#   cold       import, then straight into requests (a worker without preload)
+#   warmed     import + app.startup.warm_up() first (what preload_app does)
+#   warmed+bc  as warmed, with the Jinja bytecode cache already on disk
+#
+# Run from the repo root:
+#
+#     python benchmarks/bench_startup.py --runs 5
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URLS = ('/', '/post/1', '/tags', '/login')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import microblog
+imported = time.perf_counter()
+if sys.argv[1] == '1':
+    from app.startup import warm_up
+    warm_up(microblog.app)
+warmed = time.perf_counter()
+client = microblog.app.test_client()
+first = {}
+for url in sys.argv[2:]:
+    start = time.perf_counter()
+    assert client.get(url).status_code == 200, url
+    first[url] = time.perf_counter() - start
+print(json.dumps({'import': imported - started, 'warm_up': warmed - imported, 'first': first}))
+'''
+
+
+def seed(env):
+    script = '''
+from app import db
+from app.models import User, Post, Tag
+import microblog
+with microblog.app.app_context():
+    db.create_all()
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    tag = Tag(name='bench')
+    for i in range(50):
+        post = Post(title=f'Post {i}', content=f'Post **{i}**', author=user, tags=[tag])
+        post.render()
+        db.session.add(post)
+    db.session.commit()
+'''
+    subprocess.run([sys.executable, '-c', script], env=env, cwd=ROOT, check=True)
+
+
+def run(env, warm):
+    out = subprocess.run([sys.executable, '-c', CHILD, '1' if warm else '0', *URLS],
+                         env=env, cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                   MICROBLOG_CONFIG='config.Config')
+        env.pop('JINJA_BYTECODE_CACHE_DIR', None)
+        seed(env)
+        bc_env = dict(env, JINJA_BYTECODE_CACHE_DIR=os.path.join(tmp, 'jinja'))
+        run(bc_env, True)  # fill the bytecode cache
+
+        scenarios = {'cold': (env, False), 'warmed': (env, True), 'warmed+bc': (bc_env, True)}
+        for name, (scenario_env, warm) in scenarios.items():
+            results = [run(scenario_env, warm) for _ in range(args.runs)]
+
+            def ms(values):
+                return statistics.median(values) * 1000
+
+            first = ', '.join(f'{url} {ms([r["first"][url] for r in results]):6.1f}' for url in URLS)
+            print(f'{name:10} import {ms([r["import"] for r in results]):6.1f} ms, '
+                  f'warm-up {ms([r["warm_up"] for r in results]):6.1f} ms | first requests (ms): {first}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_user_loader.py
+#
+# Times logged-in /feed views with and without the Flask-Login user cache
+# (USER_CACHE_SIZE = 0 loads the user from the database on every request).
+# Run from the repo root:
+#
+#     python benchmarks/bench_user_loader.py --posts 200 --requests 500
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Post  # noqa: E402
+from config import Config  # noqa: E402
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def run(cache_size, posts, requests):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        WTF_CSRF_ENABLED = False
+        METRICS_ENABLED = True
+        USER_CACHE_SIZE = cache_size
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        for i in range(posts):
+            post = Post(title=f'Post {i}', content=f'Post **{i}**', author=user)
+            post.render()
+            db.session.add(post)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    client.get('/feed')  # warm up
+    queries = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/feed')
+        assert response.status_code == 200
+        queries += int(QUERIES.search(response.headers['Server-Timing']).group(1))
+    return (time.perf_counter() - start) / requests * 1000, queries / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    without, without_q = run(0, args.posts, args.requests)
+    cached, cached_q = run(Config.USER_CACHE_SIZE, args.posts, args.requests)
+    print(f'/feed, user loaded per request: {without:7.2f} ms/request, {without_q:.1f} queries')
+    print(f'/feed, cached session user:     {cached:7.2f} ms/request, {cached_q:.1f} queries')
+    print(f'speedup: {without / cached:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/loadtest.py
+#
+# Seeds a database, replays a weighted read/write workload and reports
+# p50/p95/p99 latency, throughput and queries per request for each endpoint.
+#
+# In-process (Flask test client against a fresh temporary SQLite file):
+#
+#     python benchmarks/loadtest.py --users 20 --posts 5000 --tags 50 --requests 2000 \
+#         --output results.json
+#
+# Against a running server (seed it first with the emitted NDJSON, and set
+# METRICS_ENABLED=1 there to get query counts from Server-Timing):
+#
+#     python benchmarks/loadtest.py --write-seed seed.ndjson --posts 5000
+#     flask import-posts seed.ndjson
+#     python benchmarks/loadtest.py --url http://localhost:8000 --concurrency 8
+#
+# Compare against an earlier run; exits 1 if any endpoint's p95 got worse
+# than --threshold:
+#
+#     python benchmarks/loadtest.py --compare baseline.json --output new.json
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ('flask python sqlite cache feed markdown tag query index latency worker '
+         'request template stream cursor page post user api batch').split()
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+# -------------------------
+# Seeding
+# -------------------------
+def seed_records(users, posts, tags, rng):
+    """Yield NDJSON-ready post records spread over the last year."""
+    tag_names = [f'tag{i}' for i in range(tags)]
+    start = time.time() - 365 * 24 * 3600
+    for i in range(posts):
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+        yield {
+            'title': f'Post {i}: {rng.choice(WORDS)} {rng.choice(WORDS)}',
+            'content': f'# {rng.choice(WORDS).title()}\n\n{body}\n\n- **{rng.choice(WORDS)}**\n',
+            'tags': rng.sample(tag_names, k=min(len(tag_names), rng.randint(1, 3))),
+            'author': f'user{rng.randrange(users)}',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(start + i * 365 * 24 * 3600 / posts)),
+        }
+
+
+def seed_app(app, users, posts, tags, rng):
+    from app import db
+    from app.importer import import_posts
+    from app.models import User
+
+    with app.app_context():
+        db.create_all()
+        for i in range(users):
+            user = User(username=f'user{i}', email=f'user{i}@example.com')
+            user.set_password('password123')
+            db.session.add(user)
+        db.session.commit()
+        lines = ((n, json.dumps(r)) for n, r in enumerate(seed_records(users, posts, tags, rng), 1))
+        for _ in import_posts(lines, batch_size=1000):
+            pass
+
+
+# -------------------------
+# Workload
+# -------------------------
+def load_workload(path):
+    steps = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                step = json.loads(line)
+                if isinstance(step.get('json'), str):
+                    with open(os.path.join(ROOT, step['json'])) as body:
+                        step['json'] = json.load(body)
+                steps.append(step)
+    return steps
+
+
+def fill(path, rng, posts, tags):
+    return path.format(
+        page=rng.randint(1, max(1, min(posts // 5, 50))),
+        post_id=rng.randint(1, max(1, posts)),
+        tag=f'tag{rng.randrange(max(1, tags))}',
+    )
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.lock = threading.Lock()
+
+    def request(self, method, path, body):
+        with self.lock:  # the test client and SQLite session aren't shared across threads
+            response = self.client.open(path, method=method, json=body)
+            return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HTTPClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.headers.get('Server-Timing', '')
+
+
+def replay(client, steps, total, concurrency, rng_seed, posts, tags):
+    weights = [step.get('weight', 1) for step in steps]
+    samples = defaultdict(list)      # name -> [seconds]
+    queries = defaultdict(list)      # name -> [queries per request]
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    per_thread = total // concurrency
+
+    def run(thread_no):
+        rng = random.Random(rng_seed + thread_no)
+        for _ in range(per_thread):
+            step = rng.choices(steps, weights)[0]
+            path = fill(step['path'], rng, posts, tags)
+            started = time.perf_counter()
+            status, timing = client.request(step.get('method', 'GET'), path, step.get('json'))
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING_QUERIES.search(timing)
+            with lock:
+                samples[step['name']].append(elapsed)
+                if match:
+                    queries[step['name']].append(int(match.group(1)))
+                if status >= 400:
+                    errors[step['name']] += 1
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return summarise(samples, queries, errors, wall)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarise(samples, queries, errors, wall):
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'throughput_rps': round(len(values) / wall, 1),
+            'queries_per_request': round(sum(queries[name]) / len(queries[name]), 2) if queries[name] else None,
+        }
+    total = sum(len(v) for v in samples.values())
+    return {'wall_seconds': round(wall, 3), 'throughput_rps': round(total / wall, 1), 'endpoints': endpoints}
+
+
+def print_report(results):
+    print(f"{'endpoint':14} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'q/req':>6}")
+    for name, row in results['endpoints'].items():
+        qpr = '-' if row['queries_per_request'] is None else f"{row['queries_per_request']:.1f}"
+        print(f"{name:14} {row['requests']:6} {row['errors']:4} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} "
+              f"{row['p99_ms']:8.2f} {row['throughput_rps']:8.1f} {qpr:>6}")
+    print(f"total: {results['throughput_rps']} req/s over {results['wall_seconds']}s")
+
+
+def compare(baseline, results, threshold):
+    """Print p95 changes against a baseline; return True if any endpoint regressed."""
+    regressed = False
+    for name, row in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before or not before['p95_ms']:
+            continue
+        change = (row['p95_ms'] - before['p95_ms']) / before['p95_ms']
+        flag = 'REGRESSION' if change > threshold else ''
+        regressed |= bool(flag)
+        print(f"{name:14} p95 {before['p95_ms']:8.2f} -> {row['p95_ms']:8.2f} ms ({change:+.0%}) {flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed, replay a mixed workload and report latency.')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--tags', type=int, default=30)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--workload', default=os.path.join(ROOT, 'benchmarks', 'workload.jsonl'))
+    parser.add_argument('--seed', type=int, default=42, help='random seed, for repeatable runs')
+    parser.add_argument('--url', help='replay against a running server instead of in-process')
+    parser.add_argument('--no-response-cache', action='store_true')
+    parser.add_argument('--write-seed', metavar='FILE', help='only write seed posts as NDJSON and exit')
+    parser.add_argument('--output', metavar='FILE', help='save results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.write_seed:
+        with open(args.write_seed, 'w') as f:
+            for record in seed_records(args.users, args.posts, args.tags, rng):
+                f.write(json.dumps(record) + '\n')
+        return
+
+    steps = load_workload(args.workload)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            client = HTTPClient(args.url)
+        else:
+            from app import create_app
+            from config import Config
+
+            class LoadTestConfig(Config):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'loadtest.db')
+                METRICS_ENABLED = True
+                RESPONSE_CACHE_ENABLED = not args.no_response_cache
+
+            app = create_app(LoadTestConfig)
+            started = time.perf_counter()
+            seed_app(app, args.users, args.posts, args.tags, rng)
+            print(f'seeded {args.users} users, {args.posts} posts, {args.tags} tags '
+                  f'in {time.perf_counter() - started:.1f}s')
+            client = InProcessClient(app)
+
+        results = replay(client, steps, args.requests, args.concurrency, args.seed, args.posts, args.tags)
+
+    results['params'] = {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results, args.threshold):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
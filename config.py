@@ -4,7 +4,190 @@ import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def _normalize_url(url):
+    # Render/Heroku still hand out the pre-SQLAlchemy-1.4 scheme
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def database_url():
+    return _normalize_url(os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db'))
+
+
+def replica_binds():
+    """Read replicas from DATABASE_REPLICA_URLS (comma-separated), as binds."""
+    urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')]
+    return {f'replica{i}': _normalize_url(url) for i, url in enumerate(filter(None, urls), 1)}
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-secret-key"
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app.db')
+    SQLALCHEMY_DATABASE_URI = database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read replicas (app/replicas.py). Every bind named in DB_READ_REPLICAS
+    # holds a full copy of the primary; reads in GET requests go to one of
+    # them. After a write, that visitor reads from the primary for
+    # DB_PRIMARY_STICKY_SECONDS so they see their own change despite lag.
+    SQLALCHEMY_BINDS = replica_binds()
+    DB_READ_REPLICAS = tuple(SQLALCHEMY_BINDS)
+    DB_PRIMARY_STICKY_SECONDS = 5
+
+    # PRAGMAs run on every new SQLite connection (see app/database.py)
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+    }
+
+    # Password hashing (app/security.py). Use werkzeug's full method string
+    # (e.g. 'pbkdf2:sha256:600000'); stored hashes made with other
+    # parameters are upgraded on their owner's next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = 16
+    # Hashes run on a bounded thread pool (0 = inline); beyond WORKERS running
+    # plus QUEUE_LIMIT waiting, logins get a 503 instead of queueing
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE_LIMIT = 8
+    PASSWORD_HASH_TIMEOUT = 10
+    # Token bucket per username and per client IP, checked before hashing
+    LOGIN_RATE_LIMIT = 5
+    LOGIN_RATE_PERIOD = 60
+
+    # Number of reverse proxies in front of the app whose X-Forwarded-For /
+    # X-Forwarded-Proto are trusted (werkzeug ProxyFix). 0 uses the socket
+    # address, which behind a proxy is the proxy's and would put every
+    # visitor in the same login rate-limit bucket.
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # Flask-Login user loader cache (user id -> lightweight SessionUser).
+    # Set USER_CACHE_SIZE = 0 to load the user from the database every request.
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 60
+
+    # Request timing, SQL profiling, /metrics and Server-Timing (app/instrumentation.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+    # Posts per page on the home feed and tag pages
+    POSTS_PER_PAGE = 5
+
+    # Materialised home feed (app/feed.py): the newest FEED_SIZE posts are
+    # kept as pre-rendered cards; the post count behind "Page N" links is
+    # cached for FEED_COUNT_TTL seconds
+    FEED_SIZE = 500
+    FEED_COUNT_TTL = 60
+
+    # Per-user /feed timelines (app/timeline.py). Authors with fewer followers
+    # than TIMELINE_HEAVY_FOLLOWERS push new posts into cached follower
+    # timelines; heavier authors are pulled at read time.
+    TIMELINE_SIZE = 200
+    TIMELINE_HEAVY_FOLLOWERS = 1000
+    TIMELINE_CACHE_SIZE = 1024
+    TIMELINE_CACHE_TTL = 300
+
+    # Background jobs for post-write side effects (app/jobs.py). Off: handlers
+    # run inline in the request. On: run `flask worker` next to the web workers.
+    JOBS_ASYNC = os.environ.get('JOBS_ASYNC', '').lower() in ('1', 'true', 'yes')
+    JOBS_BATCH_SIZE = 100
+    JOBS_POLL_INTERVAL = 1.0
+    JOBS_MAX_ATTEMPTS = 5
+    JOBS_RETRY_DELAY = 5       # seconds, doubled after each failed attempt
+    JOBS_LOCK_TIMEOUT = 300    # reclaim jobs from a worker that died mid-batch
+
+    # `flask archive-posts` (app/archive.py): posts moved per transaction
+    ARCHIVE_BATCH_SIZE = 500
+
+    # Comments per page on /post/<id>
+    COMMENTS_PER_PAGE = 20
+
+    # Top tags shown in a profile header (/user/<name>, /api/users/<name>/posts)
+    PROFILE_TAGS = 10
+
+    # Tags shown on /tags (and the /api/tags default)
+    TAG_CLOUD_SIZE = 50
+
+    # REST API paging (GET /api/posts)
+    API_PAGE_SIZE = 20
+    API_MAX_PAGE_SIZE = 100
+    API_STREAM_BATCH_SIZE = 500
+    # Encoded post payloads, keyed by (post id, version, fields)
+    API_CACHE_SIZE = 10000
+    API_CACHE_TTL = 300
+
+    # Response compression (app/compression.py); brotli is used if installed
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+
+    # Cache lifetime of fingerprinted files under /assets (flask build-assets)
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Compiled Jinja templates on disk (`flask compile-templates`); off by default
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    # Register Flask-Migrate outside the `flask` command too (e.g. scripts
+    # that call flask_migrate.upgrade() themselves)
+    MIGRATIONS_ALWAYS = False
+
+    # Atom feeds (/feed.atom, /tag/<name>/feed.atom)
+    ATOM_FEED_SIZE = 20
+    ATOM_CACHE_SIZE = 256  # feeds kept encoded (one per tag polled)
+    ATOM_MAX_AGE = 60
+
+    # Rendered-Markdown cache (post id -> HTML), in front of Post.content_html
+    MARKDOWN_CACHE_ENABLED = True
+    MARKDOWN_CACHE_SIZE = 2048
+
+    # Bulk post import (flask import-posts, POST /api/posts/bulk)
+    IMPORT_BATCH_SIZE = 500
+    IMPORT_MAX_BATCH_SIZE = 5000
+
+    # Full-text search (see app/search.py for backends). Unset picks the
+    # backend for the database (fts5 on SQLite); on databases without one,
+    # /search and /api/search report search as unavailable.
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or None
+    SEARCH_PER_PAGE = 10
+
+    # Response cache for anonymous GETs of /, /page/<n>, /tag/<name>, /post/<id>.
+    # 'memory' is per worker (other workers catch up within the TTL);
+    # 'redis' shares entries and invalidation across workers and hosts.
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_SIZE = 512
+    RESPONSE_CACHE_TTL = 30
+
+
+class ProductionConfig(Config):
+    """Multi-worker gunicorn profile. Select with MICROBLOG_CONFIG=config.ProductionConfig."""
+
+    # Render (and most PaaS) put exactly one proxy in front of the app
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+
+    # WAL lets readers run alongside the single writer instead of blocking on
+    # it; NORMAL sync is safe in WAL mode and skips an fsync per commit.
+    # busy_timeout makes writers queue for the lock rather than fail with
+    # "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 10000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,  # KiB
+        'temp_store': 'MEMORY',
+    }
+
+    # Compiled templates on disk, shared by all workers (see app/startup.py)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(basedir, '.jinja_cache')
+
+    # Per worker process. pre_ping drops connections the server closed;
+    # recycle stays under typical Postgres/proxy idle timeouts.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
@@ -0,0 +1,29 @@
+# gunicorn.conf.py
+#
+# Picked up automatically by `gunicorn microblog:app` from the repo root.
+# Command-line flags (the Procfile's -w/-b) still win over these defaults.
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+
+# Import and build the app once in the master, then fork: workers share the
+# imported modules and compiled templates instead of each paying for them
+# on its first requests.
+preload_app = True
+
+
+def when_ready(server):
+    from app.startup import warm_up
+    count = warm_up(server.app.wsgi())
+    server.log.info('Warmed up: %d templates compiled', count)
+
+
+def post_fork(server, worker):
+    # Never share the master's pooled connections (if any) between workers
+    from app import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -1,8 +1,10 @@
 # microblog.py
 
+import os
 from app import create_app
 
-app = create_app()
+# e.g. MICROBLOG_CONFIG=config.ProductionConfig under gunicorn
+app = create_app(os.environ.get('MICROBLOG_CONFIG', 'config.Config'))
 
 if __name__ == "__main__":
     app.run(debug=True)
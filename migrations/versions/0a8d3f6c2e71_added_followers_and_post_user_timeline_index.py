@@ -0,0 +1,42 @@
+"""Added followers table, user.follower_count and post (user_id, timestamp) index
+
+Revision ID: 0a8d3f6c2e71
+Revises: f41c7d2e9b05
+Create Date: 2026-10-18 16:03:21.558920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a8d3f6c2e71'
+down_revision = 'f41c7d2e9b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('followers',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followed_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['followed_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followed_id')
+    )
+    op.create_index('ix_followers_followed_id_follower_id', 'followers', ['followed_id', 'follower_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_index('ix_post_user_id_timestamp', 'post', ['user_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_post_user_id_timestamp', table_name='post')
+    op.drop_index('ix_followers_followed_id_follower_id', table_name='followers')
+    op.drop_table('followers')
+
+    # A batch table rebuild would drop `user` under the posts pointing at
+    # it, which foreign_keys=ON rejects; SQLite >= 3.35 drops columns in place
+    op.drop_column('user', 'follower_count')
@@ -0,0 +1,25 @@
+"""Added post version counter
+
+Revision ID: 2d6c8a4f0e93
+Revises: 9b3e5f7a1c48
+Create Date: 2026-10-18 19:11:42.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d6c8a4f0e93'
+down_revision = '9b3e5f7a1c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing posts all start at version 1; only changes from here on count
+    op.add_column('post', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('post', 'version')
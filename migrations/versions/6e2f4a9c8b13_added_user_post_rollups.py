@@ -0,0 +1,55 @@
+"""Added per-user post rollups
+
+Revision ID: 6e2f4a9c8b13
+Revises: 2d6c8a4f0e93
+Create Date: 2026-10-18 21:04:37.119826
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2f4a9c8b13'
+down_revision = '2d6c8a4f0e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The (user_id, timestamp, id) post index these rollups are counted
+    # from already exists (0a8d3f6c2e71)
+    op.add_column('user', sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('last_post_at', sa.DateTime(), nullable=True))
+    op.create_table('user_tag_usage',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'tag_id')
+    )
+    op.create_index('ix_user_tag_usage_user_id_post_count', 'user_tag_usage', ['user_id', 'post_count'], unique=False)
+
+    # Backfill from existing posts
+    op.execute(
+        'UPDATE "user" SET '
+        'post_count = (SELECT count(*) FROM post WHERE post.user_id = "user".id), '
+        'last_post_at = (SELECT max(post.timestamp) FROM post WHERE post.user_id = "user".id)'
+    )
+    op.execute(
+        'INSERT INTO user_tag_usage (user_id, tag_id, post_count) '
+        'SELECT post.user_id, post_tags.tag_id, count(*) FROM post '
+        'JOIN post_tags ON post_tags.post_id = post.id '
+        'WHERE post.user_id IS NOT NULL '
+        'GROUP BY post.user_id, post_tags.tag_id'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_tag_usage_user_id_post_count', table_name='user_tag_usage')
+    op.drop_table('user_tag_usage')
+    # SQLite >= 3.35 drops columns in place (a batch rebuild of `user` would
+    # trip the foreign keys pointing at it)
+    op.drop_column('user', 'last_post_at')
+    op.drop_column('user', 'post_count')
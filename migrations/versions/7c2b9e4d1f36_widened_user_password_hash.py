@@ -0,0 +1,37 @@
+"""Widened user.password_hash to 256 characters
+
+Revision ID: 7c2b9e4d1f36
+Revises: 0a8d3f6c2e71
+Create Date: 2026-10-18 16:48:09.310542
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2b9e4d1f36'
+down_revision = '0a8d3f6c2e71'
+branch_labels = None
+depends_on = None
+
+
+def _alter_password_hash(type_, existing_type):
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        # The batch rebuild drops and recreates `user`, which fails while the
+        # foreign keys pointing at it are enforced
+        op.execute('PRAGMA foreign_keys=OFF')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash', type_=type_, existing_type=existing_type,
+                              existing_nullable=True)
+    if sqlite:
+        op.execute('PRAGMA foreign_keys=ON')
+
+
+def upgrade():
+    _alter_password_hash(sa.String(length=256), sa.String(length=128))
+
+
+def downgrade():
+    _alter_password_hash(sa.String(length=128), sa.String(length=256))
@@ -0,0 +1,94 @@
+"""Added post archive tables and monthly post counts
+
+Revision ID: 8f4b2d6e1a57
+Revises: 6e2f4a9c8b13
+Create Date: 2026-10-18 23:12:48.530961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f4b2d6e1a57'
+down_revision = '6e2f4a9c8b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=140), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('content_hash', sa.String(length=40), nullable=True),
+    sa.Column('content_html', sa.Text(), nullable=True),
+    sa.Column('likes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('dislikes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_post_archive_timestamp_id', 'post_archive', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_post_archive_user_id_timestamp', 'post_archive', ['user_id', 'timestamp', 'id'], unique=False)
+    op.create_table('post_tags_archive',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post_archive.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('post_id', 'tag_id')
+    )
+    op.create_index('ix_post_tags_archive_tag_id_post_id', 'post_tags_archive', ['tag_id', 'post_id'], unique=False)
+    op.create_table('comment_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post_archive.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comment_archive_post_id_timestamp', 'comment_archive', ['post_id', 'timestamp', 'id'], unique=False)
+    op.create_table('reaction_archive',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post_archive.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    op.create_table('post_month',
+    sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('month', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('year', 'month')
+    )
+
+    # Backfill the monthly counts; the archive is empty at this point
+    if op.get_bind().dialect.name == 'sqlite':
+        year = "CAST(strftime('%Y', timestamp) AS INTEGER)"
+        month = "CAST(strftime('%m', timestamp) AS INTEGER)"
+    else:
+        year = 'CAST(EXTRACT(YEAR FROM timestamp) AS INTEGER)'
+        month = 'CAST(EXTRACT(MONTH FROM timestamp) AS INTEGER)'
+    op.execute(
+        f'INSERT INTO post_month (year, month, post_count) '
+        f'SELECT {year}, {month}, count(*) FROM post '
+        f'WHERE timestamp IS NOT NULL GROUP BY 1, 2'
+    )
+
+
+def downgrade():
+    op.drop_table('post_month')
+    op.drop_table('reaction_archive')
+    op.drop_index('ix_comment_archive_post_id_timestamp', table_name='comment_archive')
+    op.drop_table('comment_archive')
+    op.drop_index('ix_post_tags_archive_tag_id_post_id', table_name='post_tags_archive')
+    op.drop_table('post_tags_archive')
+    op.drop_index('ix_post_archive_user_id_timestamp', table_name='post_archive')
+    op.drop_index('ix_post_archive_timestamp_id', table_name='post_archive')
+    op.drop_table('post_archive')
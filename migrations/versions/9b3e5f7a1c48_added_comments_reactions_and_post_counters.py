@@ -0,0 +1,58 @@
+"""Added comments, reactions and post counters
+
+Revision ID: 9b3e5f7a1c48
+Revises: 4e6a1b8c9d27
+Create Date: 2026-10-18 18:02:56.217604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5f7a1c48'
+down_revision = '4e6a1b8c9d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('comment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comment_post_id_timestamp', 'comment', ['post_id', 'timestamp', 'id'], unique=False)
+
+    op.create_table('reaction',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    op.create_index('ix_reaction_post_id_value', 'reaction', ['post_id', 'value'], unique=False)
+
+    # ADD COLUMN needs no table rebuild; no comments or reactions exist yet
+    op.add_column('post', sa.Column('likes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('post', sa.Column('dislikes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('post', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    # SQLite >= 3.35 drops columns in place (a batch rebuild of `post` would
+    # trip the foreign keys pointing at it)
+    op.drop_column('post', 'comment_count')
+    op.drop_column('post', 'dislikes')
+    op.drop_column('post', 'likes')
+
+    op.drop_index('ix_reaction_post_id_value', table_name='reaction')
+    op.drop_table('reaction')
+    op.drop_index('ix_comment_post_id_timestamp', table_name='comment')
+    op.drop_table('comment')
@@ -0,0 +1,76 @@
+"""Post and comment ids are never reused
+
+Revision ID: a1c5e9d3b7f2
+Revises: 8f4b2d6e1a57
+Create Date: 2026-10-19 10:41:06.274519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c5e9d3b7f2'
+down_revision = '8f4b2d6e1a57'
+branch_labels = None
+depends_on = None
+
+# Archived posts and comments keep their ids, so the hot tables must never
+# hand them out again. Postgres sequences already don't; SQLite reuses
+# max(id) + 1 unless the table is AUTOINCREMENT, which means a rebuild.
+
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+
+def _rebuild(autoincrement):
+    # Dropping the old `post` would cascade into post_tags, comment, reaction
+    # and feed_item, so foreign keys are off while the tables are swapped
+    bind = op.get_bind()
+    foreign_keys = bind.exec_driver_sql('PRAGMA foreign_keys').scalar()
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=OFF')
+    for table in ('post', 'comment'):
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}):
+            pass
+    # The FTS triggers went with the old table
+    for statement in FTS_TRIGGERS:
+        op.execute(statement)
+    with op.get_context().autocommit_block():
+        op.execute(f'PRAGMA foreign_keys={foreign_keys}')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(autoincrement=True)
+    # Start the counters past the archived ids too
+    for table, archive in (('post', 'post_archive'), ('comment', 'comment_archive')):
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', 0 "
+            f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table}')"
+        )
+        op.execute(
+            f"UPDATE sqlite_sequence SET seq = max(seq, "
+            f"coalesce((SELECT max(id) FROM {table}), 0), "
+            f"coalesce((SELECT max(id) FROM {archive}), 0)) WHERE name = '{table}'"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(autoincrement=False)
@@ -0,0 +1,47 @@
+"""Added post_fts full-text search index
+
+Revision ID: b7e41a9c2d10
+Revises: 5d1c8e0f3a2b
+Create Date: 2026-10-18 11:02:47.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e41a9c2d10'
+down_revision = '5d1c8e0f3a2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases need a different SEARCH_BACKEND
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        title, content, content='post', content_rowid='id', tokenize='porter unicode61')""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""")
+    op.execute("""CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""")
+    # Index the posts that already exist
+    op.execute("INSERT INTO post_fts(post_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS post_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS post_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS post_fts_ai')
+    op.execute('DROP TABLE IF EXISTS post_fts')
@@ -0,0 +1,62 @@
+"""Keyed post_tags and added tag.post_count
+
+Revision ID: e3f9a0c6b4d2
+Revises: b7e41a9c2d10
+Create Date: 2026-10-18 13:40:05.772914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f9a0c6b4d2'
+down_revision = 'b7e41a9c2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # post_tags had no key: copy it into a keyed table, dropping duplicate
+    # and half-empty rows on the way
+    op.create_table('post_tags_new',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+    sa.PrimaryKeyConstraint('post_id', 'tag_id')
+    )
+    op.execute(
+        'INSERT INTO post_tags_new (post_id, tag_id) '
+        'SELECT DISTINCT post_id, tag_id FROM post_tags '
+        'WHERE post_id IS NOT NULL AND tag_id IS NOT NULL'
+    )
+    op.drop_table('post_tags')
+    op.rename_table('post_tags_new', 'post_tags')
+    op.create_index('ix_post_tags_tag_id_post_id', 'post_tags', ['tag_id', 'post_id'], unique=False)
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_tag_post_count'), ['post_count'], unique=False)
+
+    op.execute(
+        'UPDATE tag SET post_count = '
+        '(SELECT count(*) FROM post_tags WHERE post_tags.tag_id = tag.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tag_post_count'))
+        batch_op.drop_column('post_count')
+
+    op.drop_index('ix_post_tags_tag_id_post_id', table_name='post_tags')
+    op.create_table('post_tags_old',
+    sa.Column('post_id', sa.Integer(), nullable=True),
+    sa.Column('tag_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], )
+    )
+    op.execute('INSERT INTO post_tags_old (post_id, tag_id) SELECT post_id, tag_id FROM post_tags')
+    op.drop_table('post_tags')
+    op.rename_table('post_tags_old', 'post_tags')
@@ -0,0 +1,36 @@
+"""Added feed_item table (materialised home feed)
+
+Revision ID: f41c7d2e9b05
+Revises: e3f9a0c6b4d2
+Create Date: 2026-10-18 15:12:47.104388
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f41c7d2e9b05'
+down_revision = 'e3f9a0c6b4d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cards are rendered from the app's templates, so the table is filled by
+    # `flask rebuild-feed` after upgrading; until then / reads fall back to
+    # the post table.
+    op.create_table('feed_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('card_html', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_feed_item_timestamp_id', 'feed_item', ['timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_feed_item_timestamp_id', table_name='feed_item')
+    op.drop_table('feed_item')
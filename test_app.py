@@ -1,17 +1,1061 @@
+import gzip
+import json
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
 import pytest
+from flask import request
+from sqlalchemy import event, func, select, text, update
 from app import create_app, db
+from app import archive, comments, profiles
+from app.models import ArchivedPost, User, Post, PostMonth, Tag, FeedItem, reactions
+from app.feed import refresh_feed
+from app.search import get_index
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    RESPONSE_CACHE_ENABLED = False
+
 
 @pytest.fixture
-def client():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
 
+
+@pytest.fixture
+def client(app):
     with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
         yield client
 
+
+@pytest.fixture
+def max_queries():
+    """Fail if the block issues more SQL statements than its budget.
+
+        with max_queries(4):
+            client.get('/')
+    """
+    @contextmanager
+    def budget(limit):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert len(statements) <= limit, (
+            f'{len(statements)} queries (budget {limit}):\n' + '\n'.join(statements)
+        )
+
+    return budget
+
+
+def make_posts(count, tags=('tech',)):
+    user = User(username='john_doe', email='john@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    tag_objs = [Tag(name=name) for name in tags]
+    start = datetime(2025, 1, 1)
+    posts = []
+    for i in range(count):
+        post = Post(title=f'Post {i}', content=f'Body **{i}**', author=user,
+                    tags=tag_objs, timestamp=start + timedelta(minutes=i))
+        post.render()
+        db.session.add(post)
+        posts.append(post)
+    refresh_feed(posts)
+    db.session.commit()
+    return user
+
+
 def test_homepage(client):
     response = client.get('/')
     assert response.status_code == 200
+
+
+def test_api_posts_cursor_pagination(client):
+    make_posts(7)
+    first = client.get('/api/posts?limit=3').get_json()
+    assert [p['title'] for p in first['posts']] == ['Post 6', 'Post 5', 'Post 4']
+    assert first['posts'][0]['tags'] == ['tech']
+
+    titles = [p['title'] for p in first['posts']]
+    cursor = first['next_cursor']
+    while cursor:
+        page = client.get(f'/api/posts?limit=3&cursor={cursor}').get_json()
+        titles += [p['title'] for p in page['posts']]
+        cursor = page['next_cursor']
+    assert titles == [f'Post {i}' for i in range(6, -1, -1)]
+
+    assert client.get('/api/posts?cursor=not-a-cursor').status_code == 400
+
+
+def test_api_posts_ndjson_stream(client):
+    make_posts(4)
+    response = client.get('/api/posts?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['title'] for row in rows] == ['Post 3', 'Post 2', 'Post 1', 'Post 0']
+
+
+def test_api_posts_field_selection(client):
+    make_posts(2)
+    posts = client.get('/api/posts?fields=title,id').get_json()['posts']
+    assert posts == [{'id': 2, 'title': 'Post 1'}, {'id': 1, 'title': 'Post 0'}]
+    full = client.get('/api/posts?limit=1').get_json()['posts'][0]
+    assert full == db.session.get(Post, 2).to_dict()
+
+    response = client.get('/api/posts?fields=id,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']
+
+
+def test_api_payloads_cached_per_post_version(client, max_queries):
+    user = make_posts(3)
+    client.get('/api/posts')
+    with max_queries(1):  # only the (id, version) listing
+        client.get('/api/posts')
+
+    post = db.session.get(Post, 3)
+    post.title = 'Edited'
+    db.session.commit()
+    assert post.version == 2
+    comments.react(1, user.id, 'like')
+    db.session.commit()
+    post = db.session.get(Post, 2)
+    post.tags = []  # tags only: no post column changes
+    db.session.commit()
+
+    with max_queries(2):  # listing + one query for the three changed posts
+        posts = client.get('/api/posts').get_json()['posts']
+    assert [(p['title'], p['likes'], p['tags']) for p in posts] == [
+        ('Edited', 0, ['tech']), ('Post 1', 0, []), ('Post 0', 1, ['tech'])]
+
+
+def test_rendered_markdown_cached_and_invalidated_on_edit(app, client):
+    make_posts(0)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    client.post('/create', data={'title': 'Hello', 'content': '# Heading', 'tags': ''})
+    post = Post.query.one()
+    assert post.content_html == '<h1>Heading</h1>'
+    assert '<h1>Heading</h1>' in client.get('/').get_data(as_text=True)
+
+    client.post(f'/edit/{post.id}', data={'title': 'Hello', 'content': '*changed*', 'tags': ''})
+    db.session.expire_all()
+    assert post.content_html == '<p><em>changed</em></p>'
+    page = client.get('/').get_data(as_text=True)
+    assert '<em>changed</em>' in page and '<h1>Heading</h1>' not in page
+
+
+def test_render_posts_backfill(app):
+    make_posts(3)
+    Post.query.update({'content_hash': None})
+    db.session.commit()
+    assert Post.query.filter(Post.content_hash.is_(None)).count() == 3
+    result = app.test_cli_runner().invoke(args=['render-posts'])
+    assert 'Rendered 3/3 posts' in result.output
+    assert Post.query.filter(Post.content_hash.is_(None)).count() == 0
+
+
+def test_feed_tag_and_detail_query_budgets(client, max_queries):
+    make_posts(12, tags=('tech', 'blog', 'python'))
+
+    # post count + pre-rendered feed cards + their live counters; the count is cached after that
+    with max_queries(3):
+        assert b'Post 11' in client.get('/').data
+    with max_queries(2):
+        assert b'Post 6' in client.get('/page/2').data
+    # tag lookup + count + posts/authors + tags + rendered HTML
+    with max_queries(5):
+        response = client.get('/tag/blog/page/3')
+        assert b'Post 1' in response.data and b'Post 2' not in response.data
+    # post/author/HTML + tags + one page of comments with their authors
+    with max_queries(3):
+        assert client.get('/post/1').status_code == 200
+
+
+def test_home_feed_keyset_walk_past_window(app, client, max_queries):
+    make_posts(12)
+    app.config['FEED_SIZE'] = 5
+    from app.feed import rebuild_feed
+    rebuild_feed()
+
+    titles, url = [], '/'
+    while url:
+        with max_queries(3):
+            html = client.get(url).get_data(as_text=True)
+        titles += re.findall(r'>(Post \d+)</h3>', html)
+        cursor = re.search(r'\?before=([\w=-]+)', html)
+        url = f'/?before={cursor.group(1)}' if cursor else None
+    assert titles == [f'Post {i}' for i in range(11, -1, -1)]
+    # past the window, numbered pages come from the post table
+    assert b'Post 1<' in client.get('/page/3').data
+    assert client.get('/?before=garbage').status_code == 400
+
+
+def test_home_feed_follows_edits_and_deletes(app, client):
+    make_posts(3)
+    app.config['FEED_SIZE'] = 2
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    client.post('/edit/3', data={'title': 'Renamed', 'content': 'New', 'tags': 'x'})
+    assert [item.id for item in FeedItem.query.order_by(FeedItem.timestamp)] == [2, 3]
+    assert 'Renamed' in db.session.get(FeedItem, 3).card_html
+
+    client.post('/delete/3')
+    # deleted card gone, the next-newest post backfilled in its place
+    assert [item.id for item in FeedItem.query.order_by(FeedItem.timestamp)] == [1, 2]
+    assert b'Renamed' not in client.get('/').data
+
+
+def make_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_follow_and_personal_timeline(app, client):
+    make_posts(3)
+    jane, bob = make_user('jane'), make_user('bob')
+    for i, user in enumerate((jane, bob, jane)):
+        db.session.add(Post(title=f'{user.username} {i}', content='c', author=user,
+                            timestamp=datetime(2025, 1, 2, i)))
+    db.session.commit()
+
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    assert client.post(f'/user/{jane.id}/follow').status_code == 302
+    assert db.session.get(User, jane.id).follower_count == 1
+    assert b'Unfollow' in client.get('/').data
+
+    titles, url = [], '/feed'
+    app.config['POSTS_PER_PAGE'] = 2
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        titles += re.findall(r'>([\w ]+ \d)</h3>', html)
+        cursor = re.search(r'\?before=([\w=-]+)', html)
+        url = f'/feed?before={cursor.group(1)}' if cursor else None
+    assert titles == ['jane 2', 'jane 0', 'Post 2', 'Post 1', 'Post 0']
+
+    client.post(f'/user/{jane.id}/unfollow')
+    assert db.session.get(User, jane.id).follower_count == 0
+    assert 'jane 2' not in client.get('/feed').get_data(as_text=True)
+
+
+def test_timeline_merges_pushed_and_pulled_authors(app, max_queries):
+    from app import timeline
+    reader = make_posts(1)
+    light, heavy = make_user('light'), make_user('heavy')
+    timeline.follow(reader.id, light.id)
+    timeline.follow(reader.id, heavy.id)
+    timeline.follow(light.id, heavy.id)
+    db.session.commit()
+    app.config['TIMELINE_HEAVY_FOLLOWERS'] = 2  # heavy now has two followers
+
+    assert timeline.timeline_page(reader.id, None, 5)[0][0].title == 'Post 0'
+    posts = []
+    for i, author in enumerate((light, heavy, light)):
+        post = Post(title=f'{author.username} {i}', content='c', author=author,
+                    timestamp=datetime(2025, 2, 1, i))
+        db.session.add(post)
+        posts.append(post)
+    db.session.commit()
+    timeline.push_posts((p.id, p.user_id, p.timestamp) for p in posts)
+    assert [e[1] for e in timeline.timelines.get(reader.id)['entries']] == [1, posts[0].id, posts[2].id]
+
+    # followed authors + catch-up past the watermark + pulled heavy posts + posts/authors + tags
+    with max_queries(5):
+        page, cursor = timeline.timeline_page(reader.id, None, 3)
+    assert [p.title for p in page] == ['light 2', 'heavy 1', 'light 0']
+    page, cursor = timeline.timeline_page(reader.id, cursor, 3)
+    assert [p.title for p in page] == ['Post 0'] and cursor is None
+
+    # Written by another process (or `flask worker`): nothing was pushed here
+    db.session.add(Post(title='light 3', content='c', author=light, timestamp=datetime(2025, 2, 2)))
+    db.session.add(Post(title='own 4', content='c', author=reader, timestamp=datetime(2025, 2, 3)))
+    db.session.commit()
+    page, _ = timeline.timeline_page(reader.id, None, 3)
+    assert [p.title for p in page] == ['own 4', 'light 3', 'light 2']
+
+
+def test_session_user_cached_and_invalidated(app, max_queries):
+    from app.models import load_user
+    user = make_posts(0)
+    user_id = str(user.id)
+    with max_queries(1):
+        session_user = load_user(user_id)
+    with max_queries(0):
+        assert load_user(user_id) is session_user
+    assert session_user.username == 'john_doe' and session_user == user
+    assert not hasattr(session_user, '__dict__')
+
+    user.username = 'john'
+    db.session.commit()
+    assert load_user(user_id).username == 'john'
+    assert load_user('999') is None
+
+
+def test_login_rehashes_outdated_password_hash(app, client):
+    from werkzeug.security import generate_password_hash
+    user = make_posts(0)
+    user.password_hash = generate_password_hash('password123', 'pbkdf2:sha256:1000')
+    db.session.commit()
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    assert db.session.get(User, user.id).password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+
+
+def test_login_rate_limited_before_hashing(app, client, monkeypatch):
+    from app import security
+    make_posts(0)
+    hashed = []
+    monkeypatch.setattr(security.pool, 'run', lambda fn, *args: hashed.append(1) or fn(*args))
+    for _ in range(app.config['LOGIN_RATE_LIMIT']):
+        assert client.post('/login', data={'username': 'john_doe', 'password': 'nope'}).status_code == 302
+    response = client.post('/login', data={'username': 'John_Doe', 'password': 'password123'})
+    assert response.status_code == 429 and 'Retry-After' in response.headers
+    assert len(hashed) == app.config['LOGIN_RATE_LIMIT']
+
+
+def test_login_limits_charge_failures_only_and_spare_the_owner(app, client):
+    from app import security
+    make_posts(0)
+    good = {'username': 'john_doe', 'password': 'password123'}
+    for _ in range(app.config['LOGIN_RATE_LIMIT'] + 1):
+        assert client.post('/login', data=good).status_code == 302
+        client.get('/logout')
+
+    # Someone else drains the account's bucket from another address...
+    for _ in range(app.config['LOGIN_RATE_LIMIT']):
+        security.login_failed('john_doe', '203.0.113.9')
+    assert not security.allow_login_attempt('john_doe', '203.0.113.9')
+    # ...but the owner, with no failures of their own, still gets in
+    assert client.post('/login', data=good).status_code == 302
+    assert client.get('/feed').status_code == 200
+
+
+def test_trusted_proxy_sets_client_address():
+    class ProxiedConfig(TestConfig):
+        TRUSTED_PROXIES = 1
+
+    app = create_app(ProxiedConfig)
+    seen = []
+    app.before_request(lambda: seen.append(request.remote_addr))
+    app.test_client().get('/nowhere', headers={'X-Forwarded-For': '198.51.100.7'})
+    assert seen == ['198.51.100.7']
+
+
+def test_password_hash_pool_sheds_load(app, client):
+    import threading
+    from app import security
+    make_posts(0)
+    security.pool.configure(workers=1, queue_limit=0, wait=5)
+    started, release = threading.Event(), threading.Event()
+    blocker = threading.Thread(target=security.pool.run, args=(lambda: started.set() or release.wait(),))
+    blocker.start()
+    started.wait()
+    try:
+        response = client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+        assert response.status_code == 503
+    finally:
+        release.set()
+        blocker.join()
+    assert client.post('/login', data={'username': 'john_doe', 'password': 'password123'}).status_code == 302
+
+
+def test_password_hash_timeout_is_busy_not_error(app, client):
+    import threading
+    from app import security
+    make_posts(0)
+    security.pool.configure(workers=1, queue_limit=1, wait=0.05)
+    release = threading.Event()
+    security.pool._executor.submit(release.wait)
+    try:
+        response = client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '2'
+    finally:
+        release.set()
+
+
+def test_async_post_writes_run_by_worker(app, client):
+    from app.models import Job
+    make_posts(1)
+    app.config['JOBS_ASYNC'] = True
+    response = client.post('/api/posts', json={'title': 'Queued', 'content': '*v1*', 'tags': ['Later']})
+    assert response.get_json()['tags'] == ['later']
+    post_id = response.get_json()['id']
+    post = db.session.get(Post, post_id)
+    assert post.tags == [] and post.content_html is None
+    assert b'<em>v1</em>' in client.get(f'/post/{post_id}').data  # rendered on the fly meanwhile
+
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    client.post(f'/edit/{post_id}', data={'title': 'Queued', 'content': '*v2*', 'tags': 'later, again'})
+    # the edit collapsed into the pending job for this post
+    assert Job.query.filter_by(idempotency_key=f'post-written:{post_id}').count() == 1
+
+    result = app.test_cli_runner().invoke(args=['worker', '--once'])
+    assert 'Ran 1 jobs' in result.output
+    db.session.expire_all()
+    post = db.session.get(Post, post_id)
+    assert sorted(t.name for t in post.tags) == ['again', 'later']
+    assert post.content_html == '<p><em>v2</em></p>'
+    assert Tag.query.filter_by(name='again').one().post_count == 1
+    assert '<em>v2</em>' in db.session.get(FeedItem, post_id).card_html
+    assert Job.query.count() == 0
+
+
+def test_async_posts_reach_cached_timelines(app, client, monkeypatch):
+    from app import timeline
+    from app.cache import LRUCache
+    make_posts(1)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    assert 'Post 0' in client.get('/feed').get_data(as_text=True)  # timeline now cached
+
+    app.config['JOBS_ASYNC'] = True
+    client.post('/create', data={'title': 'Queued', 'content': 'c', 'tags': ''})
+    # `flask worker` is its own process, with its own (empty) timeline cache
+    with monkeypatch.context() as worker_process:
+        worker_process.setattr(timeline, 'timelines', LRUCache())
+        assert 'Ran 1 jobs' in app.test_cli_runner().invoke(args=['worker', '--once']).output
+    assert 'Queued' in client.get('/feed').get_data(as_text=True)
+
+
+def test_job_batches_isolate_failures_and_retry(app):
+    from app import jobs
+    from app.models import Job
+    seen = []
+
+    @jobs.handler('test-flaky')
+    def flaky(payloads):
+        if any(p['bad'] for p in payloads):
+            raise RuntimeError('boom')
+        seen.extend(p['n'] for p in payloads)
+
+    app.config.update(JOBS_ASYNC=True, JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_DELAY=0)
+    for n in range(3):
+        jobs.enqueue('test-flaky', {'n': n, 'bad': n == 1})
+    db.session.commit()
+
+    assert jobs.work(once=True) == 2
+    assert sorted(seen) == [0, 2]
+    failed = Job.query.one()
+    assert failed.status == 'failed' and failed.attempts == 2 and 'boom' in failed.last_error
+    del jobs.HANDLERS['test-flaky']
+
+
+def test_comments_and_reactions_keep_counters(app, client, max_queries):
+    make_posts(1)
+    jane = make_user('jane')
+    app.config['COMMENTS_PER_PAGE'] = 2
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    for i in range(3):
+        response = client.post('/post/1/comment', data={'body': f'Comment {i}'})
+    assert response.headers['Location'].endswith('/post/1?page=2')
+    client.post('/post/1/like')
+    client.post('/post/1/dislike')  # switches the reaction
+    db.session.execute(reactions.insert().values(post_id=1, user_id=jane.id, value=1))
+    comments.refresh_post_counters(1)
+    db.session.commit()
+
+    post = db.session.get(Post, 1)
+    assert (post.likes, post.dislikes, post.comment_count) == (1, 1, 3)
+    with max_queries(3):
+        html = client.get('/post/1?page=2').get_data(as_text=True)
+    assert 'Comment 2' in html and 'Comment 0' not in html and 'Page 2 of 2' in html
+    # the feed shows counters without loading any comment rows
+    with max_queries(3) as statements:
+        assert '<span>3</span>' in client.get('/').get_data(as_text=True)
+    assert not [s for s in statements if 'FROM comment' in s]
+
+    client.post('/delete/1')
+    assert db.session.scalar(text('SELECT count(*) FROM comment')) == 0
+
+
+def test_resolve_tags_normalises_and_batches(app, max_queries):
+    from app.tags import resolve_tags
+    make_posts(1, tags=('tech',))
+    # one IN lookup + one upsert + one IN lookup for the new rows
+    with max_queries(3):
+        tags = resolve_tags(' Tech, new  tag,,NEW tag , python')
+    assert [t.name for t in tags] == ['tech', 'new tag', 'python']
+    assert tags[0].id == Tag.query.filter_by(name='tech').one().id
+    with max_queries(1):
+        assert [t.name for t in resolve_tags(['python', 'tech'])] == ['python', 'tech']
+    assert Tag.query.count() == 3
+
+
+def test_api_create_post_reuses_tags(client):
+    make_posts(1, tags=('api',))
+    response = client.post('/api/posts', json={'title': 'T', 'content': 'C', 'tags': ['API', 'test']})
+    assert response.status_code == 201
+    assert response.get_json()['tags'] == ['api', 'test']
+    assert Tag.query.count() == 2
+    assert client.post('/api/posts', json={'title': 'T', 'content': 'C', 'tags': 'x'}).status_code == 400
+
+
+def test_bulk_import_endpoint_batches_and_rejects(client):
+    make_posts(0)
+    lines = [
+        json.dumps({'title': f'Bulk {i}', 'content': f'*{i}*', 'tags': ['Bulk', f't{i % 2}']})
+        for i in range(5)
+    ]
+    lines.insert(2, '{"title": "no content"}')
+    lines.insert(4, 'not json')
+    lines.append(json.dumps({'title': 'x', 'content': 'y', 'author': 'nobody'}))
+    body = '\n'.join(lines) + '\n'
+    assert client.post('/api/posts/bulk', data=body).status_code == 302  # to the login page
+    assert Post.query.count() == 0
+
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    response = client.post('/api/posts/bulk?batch_size=3', data=body)
+    report = response.get_json()
+
+    assert report['inserted'] == 5
+    assert [r['line'] for r in report['rejected']] == [3, 5, 8]
+    assert report['rejected'][-1]['error'] == 'can only import your own posts'
+    assert [b['inserted'] for b in report['batches']] == [2, 2, 1]
+    assert Post.query.count() == 5
+    assert sorted(t.name for t in Tag.query) == ['bulk', 't0', 't1']
+    post = Post.query.filter_by(title='Bulk 3').one()
+    assert sorted(t.name for t in post.tags) == ['bulk', 't1']
+    assert post.author.username == 'john_doe' and post.content_html == '<p><em>3</em></p>'
+
+
+def test_import_posts_cli(app, tmp_path):
+    make_posts(0)
+    source = tmp_path / 'posts.ndjson'
+    source.write_text('\n'.join(json.dumps({'title': f'P{i}', 'content': 'c'}) for i in range(4)))
+    result = app.test_cli_runner().invoke(
+        args=['import-posts', str(source), '--batch-size', '2', '--author', 'john_doe'])
+    assert 'Imported 4 posts, rejected 0 lines' in result.output
+    assert Post.query.filter_by(user_id=User.query.one().id).count() == 4
+
+
+def test_search_ranks_and_tracks_edits(app, client):
+    make_posts(0)
+    client.post('/api/posts', json={'title': 'Flask tips', 'content': 'Routing basics'})
+    client.post('/api/posts', json={'title': 'Cooking', 'content': 'A flask of soup, then more flasks'})
+    client.post('/api/posts', json={'title': 'Gardening', 'content': 'Nothing relevant'})
+
+    results = client.get('/api/search?q=flask').get_json()
+    assert results['total'] == 2
+    assert [r['title'] for r in results['results']] == ['Flask tips', 'Cooking']
+    assert client.get('/api/search?q=gard').get_json()['results'][0]['title'] == 'Gardening'
+    # FTS5 syntax in user input is treated as plain text
+    assert client.get('/api/search?q=flask" OR (').status_code == 200
+
+    post = Post.query.filter_by(title='Gardening').one()
+    post.content = 'Now about flasks too'
+    db.session.commit()
+    assert client.get('/api/search?q=flask').get_json()['total'] == 3
+    db.session.delete(post)
+    db.session.commit()
+    assert client.get('/api/search?q=flask').get_json()['total'] == 2
+
+    page = client.get('/search?q=flask').get_data(as_text=True)
+    assert 'Search results for' in page and 'Flask tips' in page and 'Gardening' not in page
+
+
+def test_rebuild_search_index(app):
+    make_posts(3)
+    db.session.execute(text("INSERT INTO post_fts(post_fts) VALUES ('delete-all')"))
+    db.session.commit()
+    assert get_index(app).search('body')[1] == 0
+    assert 'rebuilt' in app.test_cli_runner().invoke(args=['rebuild-search']).output
+    assert get_index(app).search('body')[1] == 3
+
+
+def test_search_disabled_cleanly_without_a_backend(app, client, monkeypatch):
+    from app import search
+    assert isinstance(get_index(app), search.FTS5Index)  # picked for SQLite
+    with pytest.raises(TypeError):
+        search.SearchIndex()
+
+    monkeypatch.setattr(search, 'DIALECT_BACKENDS', {})  # e.g. Postgres
+    assert get_index(app) is None
+    response = client.get('/search?q=anything')
+    assert response.status_code == 503 and b'Search is not available' in response.data
+    assert client.get('/api/search?q=anything').status_code == 503
+    assert 'No search backend' in app.test_cli_runner().invoke(args=['rebuild-search']).output
+
+
+def test_tag_post_counts_maintained(client):
+    make_posts(0)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    client.post('/create', data={'title': 'A', 'content': 'a', 'tags': 'python, flask'})
+    client.post('/create', data={'title': 'B', 'content': 'b', 'tags': 'python'})
+    client.post('/api/posts/bulk', data=json.dumps({'title': 'C', 'content': 'c', 'tags': ['python']}))
+    counts = lambda: {t['name']: t['post_count'] for t in client.get('/api/tags').get_json()}
+    assert counts() == {'python': 3, 'flask': 1}
+
+    post_a = Post.query.filter_by(title='A').one()
+    client.post(f'/edit/{post_a.id}', data={'title': 'A', 'content': 'a', 'tags': 'sqlite'})
+    assert counts() == {'python': 2, 'sqlite': 1}
+    client.post(f'/delete/{Post.query.filter_by(title="B").one().id}')
+    assert counts() == {'python': 1, 'sqlite': 1}
+    assert client.get('/api/tags?limit=1').get_json() == [{'name': 'python', 'post_count': 1}]
+    assert b'sqlite' in client.get('/tags').data
+    assert b'sqlite' not in client.get('/tags?limit=-1').data  # clamped to one tag
+
+    # counts move by +1/-1; `flask recount` repairs any drift
+    assert [m.post_count for m in archive.months()] == [2]
+    db.session.execute(update(Tag).values(post_count=42))
+    db.session.execute(update(PostMonth).values(post_count=9))
+    db.session.add(PostMonth(year=2000, month=1, post_count=3))
+    db.session.commit()
+    assert 'Tag, author and month counts recounted' in client.application.test_cli_runner().invoke(args=['recount']).output
+    assert counts() == {'python': 1, 'sqlite': 1}
+    assert [m.post_count for m in archive.months()] == [2]
+
+
+@pytest.fixture
+def cached_client():
+    class CachedConfig(TestConfig):
+        RESPONSE_CACHE_ENABLED = True
+
+    app = create_app(CachedConfig)
+    with app.app_context():
+        db.create_all()
+        with app.test_client() as client:
+            yield client
+        db.session.remove()
+
+
+@pytest.fixture
+def csrf_client():
+    class CsrfConfig(TestConfig):
+        WTF_CSRF_ENABLED = True
+        RESPONSE_CACHE_ENABLED = True
+
+    app = create_app(CsrfConfig)
+    with app.app_context():
+        db.create_all()
+        with app.test_client() as client:
+            yield client
+        db.session.remove()
+
+
+def csrf_token(client, url):
+    return re.search(r'name="csrf_token"[^>]*value="([^"]+)"', client.get(url).get_data(as_text=True)).group(1)
+
+
+def test_post_page_cacheable_and_reactions_need_csrf(csrf_client, max_queries):
+    make_posts(1)
+    csrf_client.get('/post/1')
+    with max_queries(0):
+        response = csrf_client.get('/post/1')
+    assert 'Set-Cookie' not in response.headers and b'csrf_token' not in response.data
+
+    token = csrf_token(csrf_client, '/login')
+    csrf_client.post('/login', data={'username': 'john_doe', 'password': 'password123', 'csrf_token': token})
+    assert csrf_client.post('/post/1/like').status_code == 400
+    assert db.session.get(Post, 1).likes == 0
+    csrf_client.post('/post/1/like', data={'csrf_token': csrf_token(csrf_client, '/post/1')})
+    assert db.session.get(Post, 1).likes == 1
+
+
+def test_follow_forms_need_csrf(csrf_client):
+    make_posts(0)
+    jane = make_user('jane')
+    db.session.add(Post(title='By jane', content='c', author=jane, timestamp=datetime(2025, 1, 1),
+                        tags=[Tag(name='tech')]))
+    db.session.commit()
+    csrf_client.post('/login', data={'username': 'john_doe', 'password': 'password123',
+                                      'csrf_token': csrf_token(csrf_client, '/login')})
+    assert csrf_client.post(f'/user/{jane.id}/follow').status_code == 400
+    assert db.session.get(User, jane.id).follower_count == 0
+
+    # The tokens in the card and profile forms are accepted
+    csrf_client.post(f'/user/{jane.id}/follow', data={'csrf_token': csrf_token(csrf_client, '/tag/tech')})
+    assert db.session.get(User, jane.id).follower_count == 1
+    csrf_client.post(f'/user/{jane.id}/unfollow', data={'csrf_token': csrf_token(csrf_client, '/user/jane')})
+    assert db.session.get(User, jane.id).follower_count == 0
+
+
+def test_anonymous_response_cache_and_conditional_get(cached_client, max_queries):
+    make_posts(6)
+    first = cached_client.get('/')
+    etag = first.headers['ETag']
+    assert 'Last-Modified' in first.headers
+    with max_queries(0):
+        again = cached_client.get('/')
+        assert again.data == first.data and again.headers['ETag'] == etag
+        assert cached_client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    # any post write starts a new cache generation
+    post = Post(title='Fresh post', content='new', timestamp=datetime(2025, 2, 1))
+    db.session.add(post)
+    refresh_feed([post])
+    db.session.commit()
+    fresh = cached_client.get('/', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and b'Fresh post' in fresh.data
+    assert fresh.headers['ETag'] != etag
+
+    # logged-in users always get a freshly rendered page
+    cached_client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    assert 'ETag' not in cached_client.get('/').headers
+
+
+def test_last_modified_follows_edits_and_reactions(cached_client):
+    user = make_posts(1)
+    backend = cached_client.application.extensions['response_cache']
+    backend._changed_at -= 60  # as if nothing changed for a minute
+    first = cached_client.get('/post/1')
+    since = {'If-Modified-Since': first.headers['Last-Modified']}
+    assert cached_client.get('/post/1', headers=since).status_code == 304
+
+    # an edit keeps the post's timestamp, but the page did change
+    db.session.get(Post, 1).title = 'Edited'
+    db.session.commit()
+    edited = cached_client.get('/post/1', headers=since)
+    assert edited.status_code == 200 and b'Edited' in edited.data
+    assert edited.headers['Last-Modified'] != first.headers['Last-Modified']
+
+    # reactions leave cached pages alone but move the clock on
+    generation, backend._changed_at = backend.generation(), 0
+    comments.react(1, user.id, 'like')
+    db.session.commit()
+    assert backend.generation() == generation and backend._changed_at > 0
+
+
+def test_production_profile_tunes_sqlite(tmp_path):
+    from config import ProductionConfig
+
+    class FileConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'prod.db')
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 10000
+        assert pragma('foreign_keys') == 1
+        assert db.engine.pool.size() == 5
+        db.engine.dispose()
+
+
+def test_metrics_and_server_timing():
+    class MetricsConfig(TestConfig):
+        METRICS_ENABLED = True
+
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+        make_posts(3)
+        client = app.test_client()
+        timing = client.get('/').headers['Server-Timing']
+        assert timing.startswith('app;dur=') and 'queries"' in timing and 'tpl;dur=' in timing
+
+        metrics = client.get('/metrics').get_data(as_text=True)
+        assert 'microblog_requests_total{endpoint="main.index",method="GET",status="200"} 1' in metrics
+        assert 'microblog_request_duration_seconds_count{endpoint="main.index"} 1' in metrics
+        assert 'microblog_sql_statements_total{endpoint="main.index"} ' in metrics
+        assert 'endpoint="metrics"' not in metrics
+
+
+def test_metrics_disabled_by_default(client):
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' not in client.get('/').headers
+
+
+def test_response_compression(client):
+    make_posts(5)
+    plain = client.get('/')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    zipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == plain.data
+    api = client.get('/api/posts', headers={'Accept-Encoding': 'gzip'})
+    assert json.loads(gzip.decompress(api.data))['posts'][0]['title'] == 'Post 4'
+
+    # under COMPRESS_MIN_SIZE
+    small = client.get('/api/posts?fields=id&limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_build_assets_fingerprints_and_precompresses(app, client, tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'site.css').write_text('body { color: #333; }\n' * 100)
+    app.static_folder = str(tmp_path)
+    assert client.get('/').status_code == 200  # no build yet: plain static URLs
+
+    result = app.test_cli_runner().invoke(args=['build-assets'])
+    assert 'Built 1 assets' in result.output
+    with app.test_request_context():
+        url = app.jinja_env.globals['asset_url']('css/site.css')
+    assert re.fullmatch(r'/assets/css/site\.[0-9a-f]{8}\.css', url)
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert gzip.decompress(response.data) == (tmp_path / 'css' / 'site.css').read_bytes()
+    assert 'Content-Encoding' not in client.get(url).headers
+    assert client.get('/assets/css/site.css').status_code == 404
+
+
+def test_no_caching_while_replicas_catch_up(tmp_path, monkeypatch):
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.db"}'
+        SQLALCHEMY_BINDS = {'replica1': f'sqlite:///{tmp_path / "replica1.db"}'}
+        DB_READ_REPLICAS = ('replica1',)
+        RESPONSE_CACHE_ENABLED = True
+
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica1'])
+        make_posts(1)
+        with db.engines['replica1'].begin() as conn:  # the edit below never reaches it
+            conn.execute(Post.__table__.insert(), {'id': 1, 'title': 'Post 0', 'content': 'x'})
+        db.session.get(Post, 1).title = 'Edited'
+        db.session.commit()
+        client = app.test_client()
+        backend = app.extensions['response_cache']
+
+        stale = client.get('/post/1')
+        assert b'Post 0' in stale.data and 'ETag' not in stale.headers
+
+        backend._bumped_at -= app.config['DB_PRIMARY_STICKY_SECONDS']
+        assert 'ETag' in client.get('/post/1').headers
+
+
+def test_read_replica_routing(tmp_path, monkeypatch):
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.db"}'
+        SQLALCHEMY_BINDS = {'replica1': f'sqlite:///{tmp_path / "replica1.db"}'}
+        DB_READ_REPLICAS = ('replica1',)
+
+    # init_app registers a metadata per bind on the shared `db`; keep it to this test
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica1'])
+        make_posts(2)
+        with db.engines['replica1'].begin() as conn:  # a replica lagging one post behind
+            conn.execute(Post.__table__.insert(), {'id': 1, 'title': 'Post 0', 'content': 'x'})
+        client = app.test_client()
+        count = select(func.count()).select_from(Post)
+
+        assert [p['title'] for p in client.get('/api/posts').get_json()['posts']] == ['Post 0']
+        assert db.session.scalar(count) == 2  # no request: primary
+
+        with app.test_request_context('/'):
+            assert db.session.scalar(count) == 1
+            db.session.add(Post(title='Draft', content='x'))
+            db.session.flush()
+            assert db.session.scalar(count) == 3  # read-after-write within the session
+            db.session.rollback()
+
+        # a visitor who just wrote reads their own write on the next GET
+        assert client.post('/api/posts', json={'title': 'Mine', 'content': 'x'}).status_code == 201
+        titles = [p['title'] for p in client.get('/api/posts').get_json()['posts']]
+        assert titles == ['Mine', 'Post 1', 'Post 0']
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_atom_feeds_cached_and_conditional(client, max_queries):
+    from xml.etree import ElementTree
+    atom = '{http://www.w3.org/2005/Atom}'
+    make_posts(3, tags=('tech', 'blog'))
+
+    response = client.get('/feed.atom')
+    assert response.mimetype == 'application/atom+xml'
+    feed = ElementTree.fromstring(response.data)
+    assert [e.findtext(f'{atom}title') for e in feed.iter(f'{atom}entry')] == ['Post 2', 'Post 1', 'Post 0']
+    assert '<strong>2</strong>' in feed.find(f'{atom}entry').findtext(f'{atom}content')
+
+    with max_queries(0):
+        assert client.get('/feed.atom', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        assert client.get('/feed.atom', headers={
+            'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+    post = db.session.get(Post, 3)
+    post.title = 'Edited'
+    db.session.commit()
+    with max_queries(3):  # refs + the one changed post + its tags
+        edited = client.get('/feed.atom', headers={'If-None-Match': response.headers['ETag']})
+    assert edited.status_code == 200 and b'<title>Edited</title>' in edited.data
+
+    tag_feed = ElementTree.fromstring(client.get('/tag/blog/feed.atom').data)
+    assert tag_feed.findtext(f'{atom}title') == 'Microblog: #blog'
+    assert len(list(tag_feed.iter(f'{atom}entry'))) == 3
+    assert client.get('/tag/nope/feed.atom').status_code == 404
+
+
+def test_atom_feeds_follow_changes_made_elsewhere(cached_client, monkeypatch):
+    from app import syndication
+    make_posts(2)
+    assert b'<title>Post 1</title>' in cached_client.get('/feed.atom').data
+
+    # Another process edits a post: this one gets no posts_changed signal
+    db.session.execute(text("UPDATE post SET title = 'Elsewhere', version = version + 1 WHERE id = 2"))
+    db.session.commit()
+    assert b'Elsewhere' not in cached_client.get('/feed.atom').data
+
+    # ...but the shared response cache generation moves on
+    cached_client.application.extensions['response_cache'].bump_generation()
+    assert b'<title>Elsewhere</title>' in cached_client.get('/feed.atom').data
+
+    # and without one, entries expire after ATOM_MAX_AGE
+    db.session.execute(text("UPDATE post SET title = 'Later', version = version + 1 WHERE id = 2"))
+    db.session.commit()
+    assert syndication.feed_cache.ttl == cached_client.application.config['ATOM_MAX_AGE']
+    monkeypatch.setattr(syndication.feed_cache, 'ttl', 0.01)
+    syndication.feed_cache.clear()
+    cached_client.get('/feed.atom')
+    db.session.execute(text("UPDATE post SET title = 'Latest', version = version + 1 WHERE id = 2"))
+    db.session.commit()
+    import time
+    time.sleep(0.02)
+    assert b'<title>Latest</title>' in cached_client.get('/feed.atom').data
+
+
+def test_startup_warm_up_and_bytecode_cache(tmp_path):
+    import markdown
+    from app import rendering
+    from app.startup import warm_up
+
+    class StartupConfig(TestConfig):
+        JINJA_BYTECODE_CACHE_DIR = str(tmp_path / 'jinja')
+
+    app = create_app(StartupConfig)
+    assert 'migrate' not in app.extensions  # only under the `flask` command
+    assert warm_up(app) == len(app.jinja_env.list_templates())
+    assert len(list((tmp_path / 'jinja').iterdir())) == len(app.jinja_env.list_templates())
+
+    text = '# Title\n\n```\ncode\n```\n\nSome *text*'
+    assert rendering.converter() is rendering.converter()
+    assert rendering.render_markdown(text) == markdown.markdown(text, extensions=['fenced_code'])
+    assert rendering.render_markdown('plain') == '<p>plain</p>'  # no state left over
+
+
+def test_profile_rollups_follow_creates_and_deletes(client, max_queries):
+    make_posts(0)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    for title, tags in (('One', 'a, b'), ('Two', 'a'), ('Three', '')):
+        client.post('/create', data={'title': title, 'content': 'x', 'tags': tags})
+    user = User.query.one()
+    assert user.post_count == 3
+    assert user.last_post_at == db.session.scalar(select(func.max(Post.timestamp)))
+
+    # user + hot and archived posts/authors + tags + rendered HTML + top tags; no aggregates
+    with max_queries(6) as statements:
+        page = client.get('/user/john_doe').get_data(as_text=True)
+    assert not any('count(' in sql.lower() or 'max(' in sql.lower() for sql in statements)
+    assert '3 posts' in page and 'a (2)' in page and 'b (1)' in page
+
+    client.post('/delete/1')
+    page = client.get('/user/john_doe').get_data(as_text=True)
+    assert '2 posts' in page and 'a (1)' in page and 'b (' not in page
+
+    first = client.get('/api/users/john_doe/posts?limit=1').get_json()
+    assert first['user']['post_count'] == 2
+    assert first['user']['top_tags'] == [{'name': 'a', 'post_count': 1}]
+    assert [p['title'] for p in first['posts']] == ['Three']
+    rest = client.get(f"/api/users/john_doe/posts?cursor={first['next_cursor']}").get_json()
+    assert [p['title'] for p in rest['posts']] == ['Two'] and rest['next_cursor'] is None
+    assert client.get('/api/users/nobody/posts').status_code == 404
+    assert client.get('/user/nobody').status_code == 404
+
+    # writes move the rollups by deltas; nothing re-aggregates the author's history
+    with max_queries(100) as statements:
+        client.post('/create', data={'title': 'Four', 'content': 'x', 'tags': 'a, c'})
+        four = Post.query.filter_by(title='Four').one()
+        client.post(f'/edit/{four.id}', data={'title': 'Four', 'content': 'x', 'tags': 'c'})
+    assert not any('count(' in sql.lower() or 'group by' in sql.lower() for sql in statements)
+    client.post(f'/delete/{four.id}')
+    db.session.expire_all()
+    assert user.post_count == 2 and user.last_post_at == Post.query.filter_by(title='Three').one().timestamp
+    assert [(tag.name, uses) for tag, uses in profiles.top_tags(user.id, 5)] == [('a', 1)]
+    assert [m.post_count for m in archive.months()] == [2]
+
+
+def test_archive_posts_moves_cold_posts_and_keeps_reads(client, max_queries):
+    make_posts(0)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    records = [{'title': f'Old {i}', 'content': 'old', 'tags': ['python'], 'author': 'john_doe',
+                'timestamp': f'2024-0{1 + i % 2}-1{i}T12:00:00'} for i in range(4)]
+    records.append({'title': 'New', 'content': 'new', 'tags': ['python'], 'author': 'john_doe',
+                    'timestamp': '2025-03-01T12:00:00'})
+    client.post('/api/posts/bulk', data='\n'.join(json.dumps(r) for r in records))
+    old_id = Post.query.filter_by(title='Old 0').one().id
+    client.post(f'/post/{old_id}/comment', data={'body': 'still here'})
+    assert re.search(r'January 2024\s*</a>\s*<span[^>]*>\(2 posts\)', client.get('/archive').get_data(as_text=True))
+
+    result = client.application.test_cli_runner().invoke(
+        args=['archive-posts', '--before', '2025-01-01', '--batch-size', '3'])
+    assert 'Archived 4 posts older than 2025-01-01' in result.output
+    assert [p.title for p in Post.query.all()] == ['New']
+    assert db.session.scalar(select(func.count()).select_from(ArchivedPost)) == 4
+
+    # Counts cover both tables, so archiving leaves them alone
+    assert Tag.query.filter_by(name='python').one().post_count == 5
+    assert User.query.one().post_count == 5
+    assert [(m.year, m.month, m.post_count) for m in archive.months()] == [
+        (2025, 3, 1), (2024, 2, 2), (2024, 1, 2)]
+
+    # By id and by tag, newest first across both tables
+    page = client.get(f'/post/{old_id}').get_data(as_text=True)
+    assert 'Old 0' in page and 'still here' in page and 'comments are closed' in page
+    assert client.post(f'/edit/{old_id}').status_code == 404
+    # tag + merged ids + posts/authors and tags from each table + rendered HTML
+    with max_queries(7):
+        page = client.get('/tag/python').get_data(as_text=True)
+    assert re.findall(r'(New|Old \d)', page)[:5] == ['New', 'Old 3', 'Old 1', 'Old 2', 'Old 0']
+
+    page = client.get('/archive/2024/2').get_data(as_text=True)
+    assert 'February 2024' in page and 'Old 1' in page and 'Old 3' in page and 'Old 0' not in page
+    assert client.get('/archive/2024/13').status_code == 404
+    assert [p['title'] for p in client.get('/api/posts').get_json()['posts']] == ['New']
+
+
+def test_negative_pages_start_at_one(client):
+    make_posts(3)
+    for url in ('/?page=-3', '/tag/tech?page=-100'):
+        page = client.get(url).get_data(as_text=True)
+        assert 'Page 1' in page and 'Post 2' in page
+    assert 'Page 1' in client.get('/archive/2025/1?page=-100').get_data(as_text=True)
+    assert archive._newest(select(Post.id, Post.timestamp), select(ArchivedPost.id, ArchivedPost.timestamp),
+                           -500, 5) == []
+
+
+def test_archived_ids_are_never_reused(client):
+    make_posts(0)
+    client.post('/login', data={'username': 'john_doe', 'password': 'password123'})
+    records = [{'title': f'Old {i}', 'content': 'old', 'author': 'john_doe',
+                'timestamp': f'2024-01-1{i}T12:00:00'} for i in range(3)]
+    client.post('/api/posts/bulk', data='\n'.join(json.dumps(r) for r in records))
+    old_id = Post.query.filter_by(title='Old 2').one().id
+    client.post(f'/post/{old_id}/comment', data={'body': 'newest comment'})
+
+    # Everything, including the newest post and comment, goes to the archive
+    list(archive.archive_posts(datetime(2025, 1, 1)))
+    assert Post.query.count() == 0
+
+    client.post('/create', data={'title': 'Fresh', 'content': 'new', 'tags': ''})
+    fresh = Post.query.one()
+    assert fresh.id > old_id
+    client.post(f'/post/{fresh.id}/comment', data={'body': 'first'})
+    assert db.session.scalar(select(func.max(comments.Comment.id))) > 1
+    assert b'Old 2' in client.get(f'/post/{old_id}').data